@@ -0,0 +1,170 @@
+import os, json, zlib, inspect, threading
+import numpy as np
+import pandas as pd
+from indicadores import FEATURES, ESTADO, calcular_indicadores, calcular_estado, paso_indicadores
+
+# ==========================================
+# ALMACÉN COLUMNAR DE FEATURES (memmap)
+# ==========================================
+# Un directorio por (símbolo, timeframe, versión de la definición) con un .npy por columna y un
+# meta.json con las filas válidas. Solo guarda velas CERRADAS y solo crece por el final:
+#  - El bot es el único escritor: añade las velas nuevas recalculando una cola de calentamiento.
+#  - Entrenamiento, inferencia y optimizador leen con mmap_mode='r' (vistas sin copia).
+#  - Guarda también ESTADO (medias del RSI): la vela en formación se calcula en O(1) con
+#    paso_indicadores desde la última fila, sin recalcular una ventana de velas.
+#  - La versión es un hash de la definición de indicadores + columnas: si cambia se
+#    reconstruye en un directorio nuevo y los lectores nunca mezclan versiones.
+# Orden de escritura: datos -> flush -> meta.json (atómico). Un lector que ve `filas` = n
+# tiene las n primeras filas completas, aunque el escritor esté añadiendo, creciendo o reconstruyendo
+# (al crecer o reconstruir se escriben `<columna>_<capacidad>[g<generación>].npy` nuevos y meta.json
+# apunta a ellos; nunca se reescriben filas ya publicadas).
+
+RAIZ = os.path.join("memoria_ia", "features")
+COLUMNAS_VELA = ['time', 'open', 'high', 'low', 'close', 'tick_volume']
+COLUMNAS = COLUMNAS_VELA + list(dict.fromkeys(FEATURES + ['atr'] + ESTADO))
+TIPOS = {'time': np.int64, 'tick_volume': np.int64}
+CALENTAMIENTO = 1000  # Velas guardadas que se recalculan al añadir (EMA 200 converge de sobra)
+
+def version_definicion():
+    fuente = "".join(inspect.getsource(f) for f in (calcular_indicadores, calcular_estado, paso_indicadores)) + ",".join(COLUMNAS)
+    return f"{zlib.crc32(fuente.encode()):08x}"
+
+def _sufijo(capacidad, generacion=0):
+    return f"{capacidad}g{generacion}" if generacion else f"{capacidad}"
+
+def _escribir_meta(ruta, meta):
+    tmp = os.path.join(ruta, "meta.json.tmp")
+    with open(tmp, "w") as f: json.dump(meta, f)
+    os.replace(tmp, os.path.join(ruta, "meta.json"))
+
+class AlmacenFeatures:
+    def __init__(self, timeframe, raiz=RAIZ, capacidad_inicial=4096):
+        self.timeframe, self.raiz, self.capacidad_inicial = timeframe, raiz, capacidad_inicial
+        self.version = version_definicion()
+        self._locks, self._lock = {}, threading.Lock()
+
+    def ruta(self, symbol):
+        return os.path.join(self.raiz, f"{symbol}_{self.timeframe}_{self.version}")
+
+    def _lock_simbolo(self, symbol):
+        with self._lock: return self._locks.setdefault(symbol, threading.Lock())
+
+    def meta(self, symbol):
+        try:
+            with open(os.path.join(self.ruta(symbol), "meta.json")) as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def filas(self, symbol):
+        m = self.meta(symbol)
+        return m["filas"] if m else 0
+
+    # --- Lectura (cualquier proceso) ---
+
+    def leer(self, symbol, ultimas=None, columnas=COLUMNAS):
+        """dict columna -> vista memmap de solo lectura de las velas cerradas (sin copia)"""
+        for intento in range(2):
+            m = self.meta(symbol)
+            if not m or not m["filas"]: return None
+            n, ruta = m["filas"], self.ruta(symbol)
+            ini = 0 if ultimas is None else max(n - ultimas, 0)
+            try:
+                sufijo = _sufijo(m["capacidad"], m.get("generacion", 0))
+                return {c: np.load(os.path.join(ruta, f"{c}_{sufijo}.npy"), mmap_mode='r')[ini:n] for c in columnas}
+            except FileNotFoundError:
+                if intento: raise  # El escritor creció o reconstruyó entre meta y np.load: releer meta una vez
+
+    def leer_df(self, symbol, ultimas=None, columnas=COLUMNAS):
+        """Igual que leer() pero en DataFrame (pandas consolida las columnas: aquí sí hay copia)"""
+        cols = self.leer(symbol, ultimas, columnas)
+        return None if cols is None else pd.DataFrame({c: np.asarray(v) for c, v in cols.items()})
+
+    def ultimo_time(self, symbol):
+        cols = self.leer(symbol, 1, ['time'])
+        return int(cols['time'][-1]) if cols else None
+
+    def vela_actual(self, symbol, vela):
+        """Fila (Series) de indicadores de la vela en formación, por recursión desde la última cerrada.
+        None si el almacén está vacío o aún sin calentar."""
+        previa = self.leer(symbol, 1)
+        if previa is None: return None
+        previa = {c: float(v[-1]) for c, v in previa.items()}
+        if any(np.isnan(v) for v in previa.values()): return None
+        return paso_indicadores(previa, vela)
+
+    # --- Escritura (solo el bot) ---
+
+    def _columna(self, ruta, c, capacidad, sufijo, anterior, n):
+        """Abre la columna en r+. Al crecer o reconstruir se escribe `<c>_<sufijo>.npy` nuevo: el fichero
+        viejo no se sustituye (en Windows no se puede mientras otro proceso lo tenga mapeado), se borra luego."""
+        fichero = os.path.join(ruta, f"{c}_{sufijo}.npy")
+        if os.path.exists(fichero) and sufijo == anterior: return np.load(fichero, mmap_mode='r+')
+        nueva = np.lib.format.open_memmap(fichero, mode='w+', dtype=TIPOS.get(c, np.float64), shape=(capacidad,))
+        if n: nueva[:n] = np.load(os.path.join(ruta, f"{c}_{anterior}.npy"), mmap_mode='r')[:n]
+        return nueva
+
+    def _purgar(self, ruta, sufijo):
+        """Borra columnas de capacidades/generaciones anteriores; las que sigan mapeadas se reintentan en el próximo cambio"""
+        for f in os.listdir(ruta):
+            if f.endswith(".npy") and not f.endswith(f"_{sufijo}.npy"):
+                try: os.remove(os.path.join(ruta, f))
+                except OSError: pass
+
+    def añadir(self, symbol, rates):
+        """Añade las velas cerradas de `rates` (array de copy_rates) posteriores a la última guardada.
+        Devuelve el número de filas añadidas."""
+        return self._escribir(symbol, rates, desde_cero=False)
+
+    def reconstruir(self, symbol, rates):
+        """Rehace el almacén solo con `rates` en ficheros de una generación nueva; los lectores siguen
+        con la anterior hasta el cambio atómico de meta.json. Devuelve las filas escritas."""
+        return self._escribir(symbol, rates, desde_cero=True)
+
+    def _escribir(self, symbol, rates, desde_cero):
+        with self._lock_simbolo(symbol):
+            ruta = self.ruta(symbol)
+            os.makedirs(ruta, exist_ok=True)
+            m = self.meta(symbol) or {"version": self.version, "symbol": symbol, "timeframe": self.timeframe,
+                                      "columnas": COLUMNAS, "filas": 0, "capacidad": 0}
+            anterior = _sufijo(m["capacidad"], m.get("generacion", 0))
+            generacion = m.get("generacion", 0) + (1 if desde_cero else 0)
+            n = 0 if desde_cero else m["filas"]
+            ultimo = self.ultimo_time(symbol) if n else None
+            nuevas = pd.DataFrame(rates)[COLUMNAS_VELA]
+            if ultimo is not None: nuevas = nuevas[nuevas['time'] > ultimo]
+            k = len(nuevas)
+            if not k: return 0
+
+            previas = self.leer_df(symbol, CALENTAMIENTO, COLUMNAS_VELA) if n else None
+            df = pd.concat([previas, nuevas], ignore_index=True) if previas is not None else nuevas.reset_index(drop=True)
+            df = calcular_estado(calcular_indicadores(df)).iloc[-k:]
+
+            capacidad = 0 if desde_cero else m["capacidad"]
+            while capacidad < n + k: capacidad = max(capacidad * 2, self.capacidad_inicial)
+            sufijo = _sufijo(capacidad, generacion)
+            for c in COLUMNAS:
+                col = self._columna(ruta, c, capacidad, sufijo, anterior, n)
+                col[n:n + k] = df[c].to_numpy(dtype=col.dtype)
+                col.flush(); del col
+            m.update(filas=n + k, capacidad=capacidad, generacion=generacion, hasta=int(df['time'].iloc[-1]),
+                     desde=int(df['time'].iloc[0]) if not n else m.get("desde"))
+            _escribir_meta(ruta, m)
+            if sufijo != anterior: self._purgar(ruta, sufijo)
+            return k
+
+    def sincronizar(self, symbol, historial=2000, lote=64):
+        """Pide a MT5 solo las velas cerradas que faltan (`historial` si está vacío). Si hay un hueco
+        que MT5 ya no cubre, se reconstruye desde cero. Devuelve las filas escritas."""
+        import MetaTrader5 as mt5
+        ultimo = self.ultimo_time(symbol) if self.filas(symbol) else None
+        if ultimo is None:
+            rates = mt5.copy_rates_from_pos(symbol, self.timeframe, 1, historial)  # pos 1: sin la vela en formación
+        else:
+            n = lote
+            while True:
+                rates = mt5.copy_rates_from_pos(symbol, self.timeframe, 1, n)
+                if rates is None or not len(rates) or rates[0]['time'] <= ultimo or n >= historial: break
+                n *= 4
+            if rates is not None and len(rates) and rates[0]['time'] > ultimo:
+                return self.reconstruir(symbol, rates)
+        if rates is None or not len(rates): return 0
+        return self.añadir(symbol, rates)
@@ -0,0 +1,217 @@
+import re, json, time, argparse, threading, tempfile
+import numpy as np
+from collections import Counter, defaultdict
+import mt5_simulado as sim
+mt5 = sim.instalar()  # Debe ir antes de importar el bot
+import tradingbot_ia as bot
+from database_manager import DatabaseManager
+from almacen_features import AlmacenFeatures
+
+# ==========================================
+# BENCHMARK DEL BUCLE PRINCIPAL (sin terminal MT5 ni MySQL)
+# ==========================================
+# Uso: python bench_bucle.py --simbolos 15 --posiciones 3 --ciclos 20 --latencia copy_rates_from_pos=5 order_send=40
+# Mide tiempo de ciclo, coste por etapa, llamadas MT5 y volumen de escritura en BD.
+# Un ciclo = un --paso simulado del Planificador real (sin sus hilos, para ser reproducible): protección,
+# un sondeo de ticks con las evaluaciones lanzadas en su pool, espera a que terminen y mantenimiento.
+# En vivo protección (INTERVALO_PROTECCION) y mantenimiento van en sus hilos con su propia cadencia.
+
+_RE_SQL = re.compile(r"^\s*(INSERT\s+(?:IGNORE\s+)?INTO|DELETE\s+FROM|UPDATE|SELECT.*?\bFROM)\s+(\w+)", re.I | re.S)
+
+class _CursorContador:
+    def __init__(self, db):
+        self.db, self._filas, self.rowcount, self.lastrowid = db, [], 0, None
+
+    def _registrar(self, query, n):
+        m = _RE_SQL.match(query)
+        clave = f"{m.group(1).split()[0].upper()} {m.group(2)}" if m else query.split()[0].upper()
+        with self.db.lock:
+            self.db.sentencias[clave] += 1
+            self.db.filas[clave] += n
+        if self.db.latencia: time.sleep(self.db.latencia)
+        return clave
+
+    def execute(self, query, params=None):
+        clave = self._registrar(query, 1)
+        self._filas, self.rowcount = [], 1
+        if clave == "SELECT trades" and "ticket" in query.split("FROM")[0]:
+            self._filas = [(t,) for t in self.db.tickets]
+        elif clave == "INSERT trades" and params:
+            if params[0] in self.db.tickets: self.rowcount = 0
+            self.db.tickets.add(params[0])
+        elif "GET_LOCK" in query:
+            self._filas = [(1,)]
+        elif "COALESCE(MAX(ts)" in query:
+            self._filas = [(0,)]
+        elif clave == "SELECT monitoring_symbols":
+            self._filas = [(i, sym) for i, sym in enumerate(params, 1)]
+        elif clave == "SELECT position_reservations":
+            self._filas = [(0, 0)]  # Sin reservas de otros shards: el tope lo decide positions_get
+
+    def executemany(self, query, seq):
+        seq = list(seq)
+        self._registrar(query, len(seq))
+        self._filas, self.rowcount = [], len(seq)
+
+    def fetchall(self): return self._filas
+    def fetchone(self): return self._filas[0] if self._filas else None
+    def close(self): pass
+
+class _ConexionContadora:
+    def __init__(self, db): self.db = db
+    def cursor(self, *args, **kwargs): return _CursorContador(self.db)
+    def commit(self): pass
+    def rollback(self): pass
+    def start_transaction(self, *args, **kwargs): pass
+    def close(self): pass
+
+class DBContador(DatabaseManager):
+    """DatabaseManager real con conexión simulada que cuenta sentencias y filas por tabla"""
+    def __init__(self, latencia=0.0):
+        super().__init__("bench", "bench", "", "bench")
+        self.latencia, self.lock = latencia, threading.Lock()
+        self.sentencias, self.filas, self.tickets = Counter(), Counter(), set()
+
+    def _get_connection(self):
+        return _ConexionContadora(self)
+
+# ==========================================
+# MEDICIÓN POR ETAPA
+# ==========================================
+
+TIEMPOS = defaultdict(list)
+_lock_tiempos = threading.Lock()
+
+def medir(objeto, nombre, etapa):
+    original = getattr(objeto, nombre)
+    def envoltura(*args, **kwargs):
+        t0 = time.perf_counter()
+        try: return original(*args, **kwargs)
+        finally:
+            with _lock_tiempos: TIEMPOS[etapa].append(time.perf_counter() - t0)
+    setattr(objeto, nombre, envoltura)
+
+class _ModeloMedido:
+    def __init__(self, modelo): self.modelo = modelo
+    def predict_proba(self, X):
+        t0 = time.perf_counter()
+        try: return self.modelo.predict_proba(X)
+        finally:
+            with _lock_tiempos: TIEMPOS["prediccion"].append(time.perf_counter() - t0)
+
+def percentiles(valores):
+    v = np.asarray(valores) * 1000
+    if not len(v): return {}
+    return {"n": len(v), "media_ms": round(float(v.mean()), 3), "p50_ms": round(float(np.percentile(v, 50)), 3),
+            "p95_ms": round(float(np.percentile(v, 95)), 3), "max_ms": round(float(v.max()), 3),
+            "total_ms": round(float(v.sum()), 3)}
+
+def parsear_latencias(pares, por_defecto_ms):
+    lat = {"*": por_defecto_ms / 1000}
+    for par in pares or []:
+        nombre, ms = par.split("=")
+        lat[nombre] = float(ms) / 1000
+    return lat
+
+def preparar(n_simbolos, n_posiciones, n_barras):
+    nombres = [f"SIM{i:02d}USD" for i in range(n_simbolos)]
+    sim.generar_sintetico(nombres, n_barras=n_barras, futuras=2000)
+    bot.db = DBContador()
+    bot.ALMACEN = AlmacenFeatures(bot.TIMEFRAME, raiz=tempfile.mkdtemp(prefix="bench_features_"))
+    for s in nombres: bot.ALMACEN.sincronizar(s, bot.HISTORIAL_ALMACEN)
+
+    # Un único modelo compartido: el entrenamiento no es lo que se mide aquí
+    _, modelo = bot.tarea_entrenamiento(nombres[0])
+    for s in nombres: bot.MODELOS_IA[s] = _ModeloMedido(modelo)
+
+    for i in range(n_posiciones):
+        s = nombres[i % n_simbolos]
+        tick = mt5.symbol_info_tick(s)
+        compra = i % 2 == 0
+        precio = tick.ask if compra else tick.bid
+        mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "symbol": s, "volume": 0.1, "magic": bot.MAGIC_NUMBER,
+                        "type": mt5.ORDER_TYPE_BUY if compra else mt5.ORDER_TYPE_SELL, "price": precio,
+                        "sl": precio * (0.9 if compra else 1.1), "tp": precio * (1.1 if compra else 0.9)})
+    return nombres
+
+def ejecutar(args):
+    sim.configurar(latencias={}, balance=10000.0)
+    activos = preparar(args.simbolos, args.posiciones, args.barras)
+    bot.db.latencia = args.latencia_db / 1000
+    for nombre, etapa in [("gestionar_proteccion_activa", "proteccion"), ("abrir_orden", "orden"),
+                          ("evaluar_simbolo", "simbolo")]:
+        medir(bot, nombre, etapa)
+    medir(bot.ALMACEN, "vela_actual", "indicadores"); medir(bot.ALMACEN, "sincronizar", "almacen")
+    for nombre in ["actualizar_estado_bot", "sincronizar_trades", "actualizar_posiciones_vivas", "volcar_monitoreo",
+                   "compactar_monitoreo"]:
+        medir(bot.db, nombre, f"db.{nombre}")
+
+    sim.configurar(latencias=parsear_latencias(args.latencia, args.latencia_mt5))
+    sim.reiniciar_estadisticas(); TIEMPOS.clear()
+    bot.db.sentencias.clear(); bot.db.filas.clear()
+
+    db_pool = bot.ThreadPoolExecutor(max_workers=2)
+    # intervalo_min_evaluacion=0: el reloj del Planificador es real y el del mercado simulado; cada --paso
+    # (>= INTERVALO_MIN_EVALUACION) trae ticks nuevos y en vivo reevaluaría todos los símbolos
+    planificador = bot.Planificador(
+        activos, evaluar=lambda s: bot.evaluar_simbolo(s, bot.POSICIONES, db_pool),
+        proteger=bot.ciclo_proteccion, mantenimiento=lambda: bot.ciclo_mantenimiento(db_pool, activos),
+        periodo_vela=bot.PERIODO_VELA_S, max_concurrencia=bot.MAX_EVALUACIONES_CONCURRENTES,
+        intervalo_min_evaluacion=0)
+    ciclos, drenajes = [], []
+    for _ in range(args.ciclos):
+        t0 = time.perf_counter()
+        planificador.proteger()
+        planificador.detectar_eventos()
+        planificador.esperar_inactivo()
+        planificador.mantenimiento()
+        t1 = time.perf_counter()
+        db_pool.submit(lambda: None).result()  # Espera a que la cola de BD se vacíe
+        ciclos.append(t1 - t0); drenajes.append(time.perf_counter() - t1)
+        sim.avanzar(args.paso)
+    db_pool.shutdown()
+
+    n = args.ciclos
+    return {
+        "config": vars(args),
+        "ciclo": percentiles(ciclos),
+        "cola_db_tras_ciclo": percentiles(drenajes),
+        "etapas": {k: percentiles(v) for k, v in sorted(TIEMPOS.items())},
+        "mt5": {k: {"llamadas_ciclo": round(c / n, 2), "ms_ciclo": round(t * 1000 / n, 3)}
+                for k, (c, t) in sorted(sim.ESTADISTICAS.items())},
+        "db": {k: {"sentencias_ciclo": round(c / n, 2), "filas_ciclo": round(bot.db.filas[k] / n, 2)}
+               for k, c in sorted(bot.db.sentencias.items())},
+        "db_total": {"sentencias_ciclo": round(sum(bot.db.sentencias.values()) / n, 2),
+                     "filas_ciclo": round(sum(bot.db.filas.values()) / n, 2)},
+    }
+
+def imprimir(r):
+    c = r["ciclo"]
+    print(f"--- CICLO ({r['config']['simbolos']} símbolos, {r['config']['posiciones']} posiciones) ---")
+    print(f"media {c['media_ms']:.1f} ms | p50 {c['p50_ms']:.1f} | p95 {c['p95_ms']:.1f} | max {c['max_ms']:.1f}")
+    print(f"cola BD tras ciclo: p95 {r['cola_db_tras_ciclo'].get('p95_ms', 0):.1f} ms")
+    print("--- ETAPAS (ms por llamada) ---")
+    for k, v in r["etapas"].items(): print(f"{k:<34} n={v['n']:<6} media {v['media_ms']:>8.3f} | p95 {v['p95_ms']:>8.3f}")
+    print("--- MT5 (por ciclo) ---")
+    for k, v in r["mt5"].items(): print(f"{k:<34} {v['llamadas_ciclo']:>7} llamadas | {v['ms_ciclo']:>8.2f} ms")
+    print("--- BD (por ciclo) ---")
+    for k, v in r["db"].items(): print(f"{k:<34} {v['sentencias_ciclo']:>7} sentencias | {v['filas_ciclo']:>8} filas")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark del bucle del bot sobre MT5 simulado")
+    ap.add_argument("--simbolos", type=int, default=15)
+    ap.add_argument("--posiciones", type=int, default=3)
+    ap.add_argument("--ciclos", type=int, default=20)
+    ap.add_argument("--barras", type=int, default=2500)
+    ap.add_argument("--paso", type=int, default=15, help="Segundos simulados entre ciclos")
+    ap.add_argument("--latencia-mt5", type=float, default=0.0, help="ms por llamada MT5 (por defecto)")
+    ap.add_argument("--latencia", nargs="*", help="Latencia por llamada: nombre=ms")
+    ap.add_argument("--latencia-db", type=float, default=0.0, help="ms por sentencia SQL")
+    ap.add_argument("--json", default=None, help="Guardar resultados en JSON")
+    args = ap.parse_args()
+
+    resultado = ejecutar(args)
+    imprimir(resultado)
+    if args.json:
+        with open(args.json, "w") as f: json.dump(resultado, f, indent=2)
+        print(f"💾 {args.json}")
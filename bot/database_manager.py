@@ -1,5 +1,134 @@
+import json, time, threading
+from collections import defaultdict
 import mysql.connector
 from datetime import datetime, timedelta
+from metricas_riesgo import MetricasRiesgo
+
+# Serie de monitoreo: codificación compacta (prob x10000 y RSI x100 en SMALLINT, estado en TINYINT)
+ESTADOS_MONITOREO = {"ESPERAR": 0, "COMPRA": 1, "VENTA": 2, "ABIERTA": 3}
+RETENCION_MONITOREO = {"monitoring_raw": 2 * 86400, "monitoring_1m": 30 * 86400, "monitoring_1h": 730 * 86400}
+MAX_MUESTRAS_PENDIENTES = 20000  # Si la BD no responde se descartan las más antiguas
+
+# bot_status.metrics la añade esquema_db.py (migración 2); sin ella se sigue publicando el latido
+QUERY_ESTADO_BOT = """
+    INSERT INTO bot_status (id, last_ping, is_active, balance, equity, metrics)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE last_ping=%s, is_active=%s, balance=%s, equity=%s, metrics=COALESCE(%s, metrics)
+"""
+QUERY_ESTADO_BOT_LEGACY = """
+    INSERT INTO bot_status (id, last_ping, is_active, balance, equity) VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE last_ping=%s, is_active=%s, balance=%s, equity=%s
+"""
+
+# Tablas que el bot crea por sí mismo si aún no se ha pasado esquema_db.py (mismo DDL que esquema_db.TABLAS)
+TABLAS_BOT = {
+    "order_executions": """
+        CREATE TABLE IF NOT EXISTS order_executions (
+            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+            ticket BIGINT UNSIGNED NULL,
+            symbol VARCHAR(32) NOT NULL,
+            side VARCHAR(4) NOT NULL,
+            volume DECIMAL(12,2) NOT NULL,
+            requested_price DECIMAL(18,6) NOT NULL,
+            fill_price DECIMAL(18,6) NULL,
+            slippage_points DECIMAL(10,1) NULL,
+            signal_to_fill_ms DECIMAL(10,2) NOT NULL,
+            send_ms DECIMAL(10,2) NOT NULL,
+            attempts TINYINT UNSIGNED NOT NULL,
+            retcode INT NOT NULL,
+            comment VARCHAR(64) NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (id),
+            KEY idx_exec_created (created_at),
+            KEY idx_exec_symbol_created (symbol, created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    "position_reservations": """
+        CREATE TABLE IF NOT EXISTS position_reservations (
+            symbol VARCHAR(32) NOT NULL,
+            shard SMALLINT UNSIGNED NOT NULL,
+            ticket BIGINT UNSIGNED NULL,
+            reserved_at DATETIME NOT NULL,
+            expires_at DATETIME NULL,
+            PRIMARY KEY (symbol),
+            KEY idx_reservas_shard (shard),
+            KEY idx_reservas_expira (expires_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    # Rollups de P&L: creados vacíos aquí; esquema_db.py (migración 4 / --reconstruir-pnl) los rellena con el histórico
+    "pnl_hourly": """
+        CREATE TABLE IF NOT EXISTS pnl_hourly (
+            symbol VARCHAR(32) NOT NULL,
+            bucket DATETIME NOT NULL,
+            net_profit DECIMAL(16,2) NOT NULL DEFAULT 0,
+            trades INT UNSIGNED NOT NULL DEFAULT 0,
+            wins INT UNSIGNED NOT NULL DEFAULT 0,
+            volume DECIMAL(16,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (symbol, bucket)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    "pnl_daily": """
+        CREATE TABLE IF NOT EXISTS pnl_daily (
+            symbol VARCHAR(32) NOT NULL,
+            bucket DATE NOT NULL,
+            net_profit DECIMAL(16,2) NOT NULL DEFAULT 0,
+            trades INT UNSIGNED NOT NULL DEFAULT 0,
+            wins INT UNSIGNED NOT NULL DEFAULT 0,
+            volume DECIMAL(16,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (symbol, bucket)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    # Serie de monitoreo (ver esquema_db.py para la codificación compacta)
+    "monitoring_symbols": """
+        CREATE TABLE IF NOT EXISTS monitoring_symbols (
+            id SMALLINT UNSIGNED NOT NULL AUTO_INCREMENT,
+            symbol VARCHAR(32) NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE KEY uq_monitoring_symbol (symbol)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    "monitoring_raw": """
+        CREATE TABLE IF NOT EXISTS monitoring_raw (
+            symbol_id SMALLINT UNSIGNED NOT NULL,
+            ts INT UNSIGNED NOT NULL,
+            price FLOAT NOT NULL,
+            rsi SMALLINT UNSIGNED NOT NULL,
+            ia_prob SMALLINT UNSIGNED NOT NULL,
+            status TINYINT UNSIGNED NOT NULL,
+            PRIMARY KEY (symbol_id, ts),
+            KEY idx_raw_ts (ts)
+        ) ENGINE=InnoDB""",
+    "monitoring_1m": """
+        CREATE TABLE IF NOT EXISTS monitoring_1m (
+            symbol_id SMALLINT UNSIGNED NOT NULL,
+            ts INT UNSIGNED NOT NULL,
+            price FLOAT NOT NULL,
+            rsi SMALLINT UNSIGNED NOT NULL,
+            ia_prob SMALLINT UNSIGNED NOT NULL,
+            ia_prob_min SMALLINT UNSIGNED NOT NULL,
+            ia_prob_max SMALLINT UNSIGNED NOT NULL,
+            n INT UNSIGNED NOT NULL,
+            PRIMARY KEY (symbol_id, ts),
+            KEY idx_1m_ts (ts)
+        ) ENGINE=InnoDB""",
+    "monitoring_1h": """
+        CREATE TABLE IF NOT EXISTS monitoring_1h (
+            symbol_id SMALLINT UNSIGNED NOT NULL,
+            ts INT UNSIGNED NOT NULL,
+            price FLOAT NOT NULL,
+            rsi SMALLINT UNSIGNED NOT NULL,
+            ia_prob SMALLINT UNSIGNED NOT NULL,
+            ia_prob_min SMALLINT UNSIGNED NOT NULL,
+            ia_prob_max SMALLINT UNSIGNED NOT NULL,
+            n INT UNSIGNED NOT NULL,
+            PRIMARY KEY (symbol_id, ts),
+            KEY idx_1h_ts (ts)
+        ) ENGINE=InnoDB""",
+    # Métricas de riesgo (metricas_riesgo.py)
+    "risk_state": """
+        CREATE TABLE IF NOT EXISTS risk_state (
+            id TINYINT UNSIGNED NOT NULL,
+            updated_at DATETIME NOT NULL,
+            state JSON NOT NULL,
+            metrics JSON NOT NULL,
+            PRIMARY KEY (id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+}
 
 class DatabaseManager:
     def __init__(self, host, user, password, database):
@@ -7,25 +136,47 @@ class DatabaseManager:
             'host': host, 'user': user, 'password': password,
             'database': database, 'connect_timeout': 10
         }
+        self._muestras, self._lock_muestras, self._ids_simbolo = [], threading.Lock(), {}
+        self._riesgo, self._lock_riesgo, self._gen_riesgo = None, threading.Lock(), 0
+        self._sin_columna_metrics = False
+        self._tablas_creadas = set()
 
     def _get_connection(self):
         return mysql.connector.connect(**self.config)
 
-    def actualizar_estado_bot(self, is_active, balance, equity):
+    def _asegurar_tabla(self, cursor, tabla, opcional=False):
+        """CREATE TABLE IF NOT EXISTS una vez por proceso. Es DDL (commit implícito): llamar antes de la transacción.
+        opcional=True: si falla (p. ej. sin permiso CREATE) solo se avisa; la escritura principal sigue."""
+        if tabla in self._tablas_creadas: return
+        try: cursor.execute(TABLAS_BOT[tabla])
+        except Exception as e:
+            if not opcional: raise
+            print(f"⚠️ No se pudo crear {tabla}: {e}")
+            return
+        self._tablas_creadas.add(tabla)
+
+    def actualizar_estado_bot(self, is_active, balance, equity, metricas=None, bot_id=1):
+        """bot_id=1: estado de la cuenta; en modo shard cada proceso publica además su fila (ver shards.py).
+        La equity de las métricas de riesgo no sale de aquí sino de sincronizar_trades (misma foto que los deals)"""
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
-            query = """
-                INSERT INTO bot_status (id, last_ping, is_active, balance, equity)
-                VALUES (1, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE last_ping=%s, is_active=%s, balance=%s, equity=%s
-            """
             now = datetime.now()
-            cursor.execute(query, (now, is_active, balance, equity, now, is_active, balance, equity))
+            m = json.dumps(metricas) if metricas is not None else None
+            if not self._sin_columna_metrics:
+                try:
+                    cursor.execute(QUERY_ESTADO_BOT, (bot_id, now, is_active, balance, equity, m, now, is_active, balance, equity, m))
+                except mysql.connector.Error as e:
+                    if e.errno != 1054: raise  # ER_BAD_FIELD_ERROR: bot_status anterior a la columna metrics
+                    self._sin_columna_metrics = True
+                    print("⚠️ bot_status sin columna 'metrics': ejecuta 'python esquema_db.py'. Se publica sin métricas.")
+            if self._sin_columna_metrics:
+                cursor.execute(QUERY_ESTADO_BOT_LEGACY, (bot_id, now, is_active, balance, equity, now, is_active, balance, equity))
             conn.commit()
             cursor.close()
             conn.close()
-        except Exception as e: print(f"Error DB Status: {e}")
+        except Exception as e:
+            print(f"Error DB Status: {e}")
 
     def sincronizar_trades(self, magic_number):
         """Módulo de Autocuración: Sincroniza historial completo MT5 vs MySQL"""
@@ -34,14 +185,18 @@ class DatabaseManager:
         history_deals = mt5.history_deals_get(from_date, datetime.now()+timedelta(days=1))
         
         if not history_deals: return
+        cuenta = mt5.account_info()  # DESPUÉS de los deals: un depósito nunca está en la equity antes que en los deals
 
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
+            for tabla in ("pnl_hourly", "pnl_daily"): self._asegurar_tabla(cursor, tabla)  # Sin ellas se perdería la sincronización entera
+            self._asegurar_tabla(cursor, "risk_state", opcional=True)
+            gen_riesgo = self._precargar_riesgo(cursor)  # ANTES de insertar: la reconstrucción lee trades
             cursor.execute("SELECT ticket FROM trades")
             db_tickets = {row[0] for row in cursor.fetchall()}
             
-            nuevos = 0
+            nuevos, insertados = 0, []
             for d in history_deals:
                 if d.ticket not in db_tickets:
                     is_balance = d.type == 2
@@ -61,20 +216,50 @@ class DatabaseManager:
                                         o_time, o_price = datetime.fromtimestamp(ed.time), ed.price
                                         break
 
-                        query = """INSERT INTO trades (ticket, symbol, type, lotage, open_price, open_time, close_price, profit, close_time, magic_number)
+                        query = """INSERT IGNORE INTO trades (ticket, symbol, type, lotage, open_price, open_time, close_price, profit, close_time, magic_number)
                                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-                        cursor.execute(query, (d.ticket, sym, t_type, d.volume, o_price, o_time, d.price, (d.profit + d.commission + d.swap), c_time, d.magic))
+                        profit = d.profit + d.commission + d.swap
+                        cursor.execute(query, (d.ticket, sym, t_type, d.volume, o_price, o_time, d.price, profit, c_time, d.magic))
+                        if cursor.rowcount == 1: insertados.append((c_time, sym, profit, d.volume))
                         nuevos += 1
-            conn.commit()
+            self._acumular_pnl(cursor, insertados)  # Misma transacción: rollups y trades no se descuadran
+            if (insertados or cuenta) and gen_riesgo is not None:
+                # Deals (BALANCE incluidos) y luego equity/balance, en esta tarea: nada se intercala entre ellos
+                def aplicar(riesgo):
+                    deals = [(c_time, sym, profit) for c_time, sym, profit, _ in sorted(insertados)]
+                    if cuenta: riesgo.registrar_cuenta(deals, cuenta.equity, cuenta.balance, datetime.now())
+                    else:
+                        for c_time, sym, profit in deals: riesgo.registrar_trade(sym, profit, c_time)
+                self._actualizar_riesgo(conn, cursor, aplicar, gen_riesgo)
+            else: conn.commit()
             if nuevos > 0: print(f"✅ Autocuración: {nuevos} registros recuperados.")
             cursor.close()
             conn.close()
-        except Exception as e: print(f"Error Sincro: {e}")
+        except Exception as e:
+            self._descartar_riesgo()
+            print(f"Error Sincro: {e}")
+
+    def _acumular_pnl(self, cursor, filas):
+        """Suma a pnl_hourly / pnl_daily los trades recién insertados [(close_time, symbol, profit, volume)].
+        symbol '*' agrega todos los símbolos operados (sin BALANCE)."""
+        if not filas: return
+        por_hora, por_dia = defaultdict(lambda: [0.0, 0, 0, 0.0]), defaultdict(lambda: [0.0, 0, 0, 0.0])
+        for c_time, sym, profit, volumen in filas:
+            for simbolo in ((sym,) if sym == "BALANCE" else (sym, "*")):
+                for acc, bucket in ((por_hora, c_time.replace(minute=0, second=0, microsecond=0)), (por_dia, c_time.date())):
+                    a = acc[(simbolo, bucket)]
+                    a[0] += profit; a[1] += 1; a[2] += profit > 0; a[3] += volumen
+        query = """INSERT INTO {} (symbol, bucket, net_profit, trades, wins, volume) VALUES (%s, %s, %s, %s, %s, %s)
+                   ON DUPLICATE KEY UPDATE net_profit=net_profit+VALUES(net_profit), trades=trades+VALUES(trades),
+                   wins=wins+VALUES(wins), volume=volume+VALUES(volume)"""
+        for tabla, acc in (("pnl_hourly", por_hora), ("pnl_daily", por_dia)):
+            cursor.executemany(query.format(tabla), [(s, b, round(v[0], 2), v[1], v[2], round(v[3], 2)) for (s, b), v in acc.items()])
 
     def actualizar_posiciones_vivas(self, posiciones, magic_number):
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
+            self._asegurar_tabla(cursor, "risk_state", opcional=True)
             cursor.execute("DELETE FROM live_positions") # Limpieza atómica
             if posiciones:
                 query = """INSERT INTO live_positions (ticket, symbol, type, lotage, price_open, price_current, sl, tp, profit, time_open)
@@ -82,19 +267,243 @@ class DatabaseManager:
                 for p in posiciones:
                     if p.magic == magic_number:
                         cursor.execute(query, (p.ticket, p.symbol, ("BUY" if p.type==0 else "SELL"), p.volume, p.price_open, p.price_current, p.sl, p.tp, p.profit, datetime.fromtimestamp(p.time)))
+            propias = [(p.symbol, "BUY" if p.type == 0 else "SELL", p.volume, p.profit) for p in posiciones if p.magic == magic_number]
+            self._actualizar_riesgo(conn, cursor, lambda r: r.registrar_posiciones(propias))
+            cursor.close()
+            conn.close()
+        except Exception as e:
+            self._descartar_riesgo()
+            print(f"Error Live Positions: {e}")
+
+    # --- Métricas de riesgo (ver metricas_riesgo.py) ---
+    # Solo las actualiza el proceso que escribe lo de la cuenta (coordinador). Bajo _lock_riesgo la mutación
+    # en memoria y el commit de risk_state van juntos para no persistir cambios ajenos a medias.
+
+    def _precargar_riesgo(self, cursor):
+        """Carga el estado antes de escribir trades y devuelve su generación; None si no se puede (ese lote
+        no se aplica al riesgo y la próxima carga lo reconstruye desde trades, ya incluido)"""
+        with self._lock_riesgo:
+            try:
+                self._metricas_riesgo(cursor)
+                return self._gen_riesgo
+            except Exception as e:
+                self._invalidar_riesgo()
+                print(f"Error Riesgo: {e}")
+                return None
+
+    def _actualizar_riesgo(self, conn, cursor, aplicar, generacion=None):
+        """aplicar(riesgo) + risk_state en la transacción en curso y commit. Si falla la parte de riesgo se
+        deshace solo ella (SAVEPOINT): latido, trades o live_positions se confirman igual.
+        `generacion` (sincronizar_trades): si el estado se descartó desde la precarga, se reconstruye con este
+        cursor, que ya ve los trades recién insertados, en vez de aplicarlos otra vez."""
+        with self._lock_riesgo:
+            try:
+                cursor.execute("SAVEPOINT riesgo")
+                if generacion is not None and generacion != self._gen_riesgo:
+                    self._riesgo = None
+                    self._metricas_riesgo(cursor, desde_trades=True)
+                else: aplicar(self._metricas_riesgo(cursor))
+                self._guardar_riesgo(cursor)
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT riesgo")
+                self._invalidar_riesgo()
+                print(f"Error Riesgo: {e}")
+            conn.commit()
+
+    def _metricas_riesgo(self, cursor, desde_trades=False):
+        """Estado en memoria; la primera vez sale de risk_state o se reconstruye desde trades"""
+        if self._riesgo is None:
+            fila = None
+            if not desde_trades:
+                cursor.execute("SELECT state FROM risk_state WHERE id=1")
+                fila = cursor.fetchone()
+            if fila: self._riesgo = MetricasRiesgo.desde_dict(json.loads(fila[0]))
+            else:
+                cursor.execute("SELECT symbol, profit, close_time FROM trades ORDER BY close_time, ticket")
+                self._riesgo = MetricasRiesgo.reconstruir(cursor.fetchall())
+                print(f"📐 Métricas de riesgo reconstruidas ({self._riesgo.trades} trades)")
+        return self._riesgo
+
+    def _invalidar_riesgo(self):
+        """Con _lock_riesgo: se recarga de risk_state, lo no confirmado no debe quedar en memoria"""
+        self._riesgo = None
+        self._gen_riesgo += 1
+
+    def _descartar_riesgo(self):
+        """Tras un error fuera del lock"""
+        with self._lock_riesgo: self._invalidar_riesgo()
+
+    def _guardar_riesgo(self, cursor):
+        query = """INSERT INTO risk_state (id, updated_at, state, metrics) VALUES (1, %s, %s, %s)
+                   ON DUPLICATE KEY UPDATE updated_at=VALUES(updated_at), state=VALUES(state), metrics=VALUES(metrics)"""
+        cursor.execute(query, (datetime.now(), json.dumps(self._riesgo.a_dict()), json.dumps(self._riesgo.resumen())))
+
+    # --- Reservas de posición entre shards ---
+    # Una fila por símbolo con posición abierta o en apertura. expires_at != NULL: reserva pendiente de
+    # confirmar (caduca si el proceso muere entre la reserva y la orden); NULL: posición confirmada.
+
+    def reservar_posicion(self, symbol, shard, max_global, ttl_s=60):
+        """Reserva atómica entre procesos: True si hay hueco bajo el tope global y el símbolo está libre"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            self._asegurar_tabla(cursor, "position_reservations")
+            cursor.execute("SELECT GET_LOCK('traderbot_admision', 5)")
+            if cursor.fetchone()[0] != 1:
+                cursor.close(); conn.close()
+                print("Error Reserva: lock de admisión ocupado"); return False
+            try:
+                cursor.execute("DELETE FROM position_reservations WHERE expires_at < NOW()")
+                cursor.execute("SELECT COUNT(*), COALESCE(SUM(symbol = %s), 0) FROM position_reservations", (symbol,))
+                total, ocupado = cursor.fetchone()
+                concedida = total < max_global and not ocupado
+                if concedida:
+                    cursor.execute("""INSERT INTO position_reservations (symbol, shard, reserved_at, expires_at)
+                                      VALUES (%s, %s, NOW(), NOW() + INTERVAL %s SECOND)""", (symbol, shard, ttl_s))
+                conn.commit()
+            finally:
+                cursor.execute("DO RELEASE_LOCK('traderbot_admision')")
+            cursor.close()
+            conn.close()
+            return concedida
+        except Exception as e:
+            print(f"Error Reserva: {e}")
+            return False  # Sin BD no se puede garantizar el tope global: no se abre
+
+    def confirmar_reserva(self, symbol, ticket):
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute("UPDATE position_reservations SET ticket=%s, expires_at=NULL, reserved_at=NOW() WHERE symbol=%s",
+                           (ticket, symbol))
             conn.commit()
             cursor.close()
             conn.close()
-        except Exception as e: print(f"Error Live Positions: {e}")
+        except Exception as e: print(f"Error Reserva: {e}")
 
-    def actualizar_monitoreo(self, symbol, price, rsi, ia_prob, status):
+    def liberar_reserva(self, symbol):
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
-            query = """INSERT INTO market_monitoring (symbol, price, rsi, ia_prob, status) VALUES (%s, %s, %s, %s, %s)
-                       ON DUPLICATE KEY UPDATE price=%s, rsi=%s, ia_prob=%s, status=%s"""
-            cursor.execute(query, (symbol, price, rsi, ia_prob, status, price, rsi, ia_prob, status))
+            cursor.execute("DELETE FROM position_reservations WHERE symbol=%s", (symbol,))
             conn.commit()
             cursor.close()
             conn.close()
-        except Exception as e: print(f"Error Monitoreo: {e}")
\ No newline at end of file
+        except Exception as e: print(f"Error Reserva: {e}")
+
+    def reconciliar_reservas(self, shard, abiertas, margen_s=60):
+        """Cuadra las reservas del shard con sus posiciones reales {symbol: ticket}: adopta las que falten
+        (p. ej. tras reiniciar) y borra las confirmadas que ya se cerraron. `margen_s` evita borrar una
+        confirmación más reciente que la foto de posiciones."""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            self._asegurar_tabla(cursor, "position_reservations")  # La reconciliación puede ser el primer uso
+            if abiertas:
+                cursor.executemany("""INSERT INTO position_reservations (symbol, shard, ticket, reserved_at, expires_at)
+                                      VALUES (%s, %s, %s, NOW(), NULL)
+                                      ON DUPLICATE KEY UPDATE ticket=VALUES(ticket), expires_at=NULL""",
+                                   [(s, shard, t) for s, t in abiertas.items()])
+            cursor.execute("SELECT symbol FROM position_reservations WHERE shard=%s AND expires_at IS NULL "
+                           "AND reserved_at < NOW() - INTERVAL %s SECOND", (shard, margen_s))
+            cerradas = [(r[0],) for r in cursor.fetchall() if r[0] not in abiertas]
+            if cerradas:
+                cursor.executemany("DELETE FROM position_reservations WHERE symbol=%s AND expires_at IS NULL", cerradas)
+            conn.commit()
+            cursor.close()
+            conn.close()
+        except Exception as e: print(f"Error Reservas: {e}")
+
+    def registrar_ejecucion(self, e):
+        """Guarda latencia señal→ejecución y deslizamiento de cada orden enviada"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            self._asegurar_tabla(cursor, "order_executions")
+            query = """INSERT INTO order_executions (ticket, symbol, side, volume, requested_price, fill_price, slippage_points,
+                       signal_to_fill_ms, send_ms, attempts, retcode, comment, created_at)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+            cursor.execute(query, (e['ticket'], e['symbol'], e['side'], e['volume'], e['requested_price'], e['fill_price'],
+                                   e['slippage_points'], e['signal_to_fill_ms'], e['send_ms'], e['attempts'], e['retcode'],
+                                   e['comment'], e['created_at']))
+            conn.commit()
+            cursor.close()
+            conn.close()
+        except Exception as e: print(f"Error Ejecución: {e}")
+
+    # --- Serie de monitoreo (append-only, escrita en lote) ---
+
+    def registrar_muestra(self, symbol, price, rsi, ia_prob, status):
+        """Sin E/S: la muestra se acumula y volcar_monitoreo() la escribe junto con las demás"""
+        with self._lock_muestras: self._muestras.append((symbol, int(time.time()), price, rsi, ia_prob, status))
+
+    def _ids_simbolos(self, cursor, simbolos):
+        """(ids de todos, ids nuevos). Los nuevos salen de la transacción en curso: el llamador los pasa a
+        la caché solo tras el commit (si hay rollback, la fila de monitoring_symbols tampoco existe)"""
+        faltan = [s for s in simbolos if s not in self._ids_simbolo]
+        nuevos = {}
+        if faltan:
+            cursor.executemany("INSERT IGNORE INTO monitoring_symbols (symbol) VALUES (%s)", [(s,) for s in faltan])
+            cursor.execute(f"SELECT id, symbol FROM monitoring_symbols WHERE symbol IN ({', '.join(['%s'] * len(faltan))})", faltan)
+            nuevos = {sym: i for i, sym in cursor.fetchall()}
+        return {**self._ids_simbolo, **nuevos}, nuevos
+
+    def volcar_monitoreo(self):
+        """Una conexión y una transacción por lote: serie (monitoring_raw) + último valor (market_monitoring)"""
+        with self._lock_muestras: muestras, self._muestras = self._muestras, []
+        if not muestras: return 0
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            # Antes de la transacción: sin la serie fallaría también el upsert de market_monitoring (/stats/monitoring)
+            for tabla in ("monitoring_symbols", "monitoring_raw"): self._asegurar_tabla(cursor, tabla)
+            ids, nuevos = self._ids_simbolos(cursor, {m[0] for m in muestras})
+            cursor.executemany("""INSERT IGNORE INTO monitoring_raw (symbol_id, ts, price, rsi, ia_prob, status)
+                                  VALUES (%s, %s, %s, %s, %s, %s)""",
+                               [(ids[sym], ts, price, round(rsi * 100), round(prob * 10000), ESTADOS_MONITOREO.get(st, 0))
+                                for sym, ts, price, rsi, prob, st in muestras])
+            ultimas = {m[0]: m for m in muestras}
+            cursor.executemany("""INSERT INTO market_monitoring (symbol, price, rsi, ia_prob, status) VALUES (%s, %s, %s, %s, %s)
+                                  ON DUPLICATE KEY UPDATE price=VALUES(price), rsi=VALUES(rsi), ia_prob=VALUES(ia_prob), status=VALUES(status)""",
+                               [(sym, price, rsi, prob, st) for sym, _, price, rsi, prob, st in ultimas.values()])
+            conn.commit()
+            self._ids_simbolo.update(nuevos)
+            cursor.close()
+            conn.close()
+            return len(muestras)
+        except Exception as e:
+            print(f"Error Monitoreo: {e}")
+            with self._lock_muestras: self._muestras = (muestras + self._muestras)[-MAX_MUESTRAS_PENDIENTES:]
+            return 0
+
+    def compactar_monitoreo(self):
+        """raw -> 1 min -> 1 h y purga por retención. Idempotente: recalcula desde el último bucket escrito
+        (solo buckets completos), así que puede correr a cualquier cadencia o tras una parada."""
+        ahora = int(time.time())
+        niveles = [  # (origen, destino, paso, promedio ponderado / min / max / n según el origen)
+            ("monitoring_raw", "monitoring_1m", 60,
+             "AVG(price), ROUND(AVG(rsi)), ROUND(AVG(ia_prob)), MIN(ia_prob), MAX(ia_prob), COUNT(*)"),
+            ("monitoring_1m", "monitoring_1h", 3600,
+             "SUM(price * n) / SUM(n), ROUND(SUM(rsi * n) / SUM(n)), ROUND(SUM(ia_prob * n) / SUM(n)), "
+             "MIN(ia_prob_min), MAX(ia_prob_max), SUM(n)"),
+        ]
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            for tabla in ("monitoring_raw", "monitoring_1m", "monitoring_1h"): self._asegurar_tabla(cursor, tabla)
+            for origen, destino, paso, agregados in niveles:
+                cursor.execute(f"SELECT COALESCE(MAX(ts), 0) FROM {destino}")
+                desde = max(cursor.fetchone()[0] or 0, ahora - RETENCION_MONITOREO[origen])
+                cursor.execute(f"""INSERT INTO {destino} (symbol_id, ts, price, rsi, ia_prob, ia_prob_min, ia_prob_max, n)
+                                   SELECT symbol_id, ts - MOD(ts, {paso}), {agregados} FROM {origen}
+                                   WHERE ts >= %s AND ts < %s GROUP BY symbol_id, ts - MOD(ts, {paso})
+                                   ON DUPLICATE KEY UPDATE price=VALUES(price), rsi=VALUES(rsi), ia_prob=VALUES(ia_prob),
+                                   ia_prob_min=VALUES(ia_prob_min), ia_prob_max=VALUES(ia_prob_max), n=VALUES(n)""",
+                               (desde - desde % paso, ahora - ahora % paso))
+                conn.commit()
+            for tabla, retencion in RETENCION_MONITOREO.items():
+                cursor.execute(f"DELETE FROM {tabla} WHERE ts < %s", (ahora - retencion,))
+                conn.commit()
+            cursor.close()
+            conn.close()
+        except Exception as e: print(f"Error Compactación: {e}")
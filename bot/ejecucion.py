@@ -0,0 +1,114 @@
+import time, threading
+import MetaTrader5 as mt5
+from collections import namedtuple
+from datetime import datetime
+from metricas import METRICAS
+
+# ==========================================
+# EJECUCIÓN DE ÓRDENES DE BAJA LATENCIA
+# ==========================================
+# - TablaSimbolos: especificación de cada símbolo cacheada (nada de symbol_info en el camino caliente)
+# - Plantillas de petición por (símbolo, lado) construidas una vez
+# - Reintento acotado ante recotización, retcode siempre comprobado
+# - Latencia señal→ejecución y deslizamiento medidos por orden
+
+EspecSimbolo = namedtuple("EspecSimbolo", "name digits point volume_min volume_max volume_step filling "
+                                          "stops_level freeze_level contract_size")
+Ejecucion = namedtuple("Ejecucion", "ticket symbol side volume requested_price fill_price slippage_points "
+                                    "signal_to_fill_ms send_ms attempts retcode comment created_at")
+
+RETCODES_RECOTIZACION = {mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED, mt5.TRADE_RETCODE_PRICE_OFF}
+
+def modo_llenado(filling_mode):
+    """Bits de symbol_info.filling_mode: 1 = FOK permitido, 2 = IOC permitido; si no, RETURN"""
+    if filling_mode & 1: return mt5.ORDER_FILLING_FOK
+    if filling_mode & 2: return mt5.ORDER_FILLING_IOC
+    return mt5.ORDER_FILLING_RETURN
+
+class TablaSimbolos:
+    def __init__(self, ttl=3600.0):
+        self.ttl, self._datos, self._lock = ttl, {}, threading.Lock()
+
+    def _cargar(self, symbol):
+        info = mt5.symbol_info(symbol)
+        if info is None: return None
+        espec = EspecSimbolo(info.name, info.digits, info.point, info.volume_min, info.volume_max, info.volume_step,
+                             modo_llenado(info.filling_mode), info.trade_stops_level, info.trade_freeze_level,
+                             info.trade_contract_size)
+        with self._lock: self._datos[symbol] = (espec, time.monotonic())
+        return espec
+
+    def precargar(self, simbolos):
+        for s in simbolos: self._cargar(s)
+
+    def obtener(self, symbol):
+        with self._lock: dato = self._datos.get(symbol)
+        if dato is None or time.monotonic() - dato[1] > self.ttl:
+            METRICAS.incrementar("especificacion_recargada")
+            return self._cargar(symbol) or (dato[0] if dato else None)
+        return dato[0]
+
+    def normalizar_volumen(self, espec, volumen):
+        pasos = round(volumen / espec.volume_step)
+        return round(min(max(pasos * espec.volume_step, espec.volume_min), espec.volume_max), 8)
+
+class Ejecutor:
+    def __init__(self, simbolos, magic, lote_base, reintentos=2, desviacion_puntos=20):
+        self.simbolos, self.magic, self.lote_base = simbolos, magic, lote_base
+        self.reintentos, self.desviacion_puntos = reintentos, desviacion_puntos
+        self._plantillas = {}
+
+    def plantilla(self, symbol, compra):
+        clave = (symbol, compra)
+        if clave not in self._plantillas:
+            espec = self.simbolos.obtener(symbol)
+            if espec is None: return None
+            self._plantillas[clave] = {
+                "action": mt5.TRADE_ACTION_DEAL, "symbol": symbol,
+                "volume": self.simbolos.normalizar_volumen(espec, self.lote_base(symbol)),
+                "type": mt5.ORDER_TYPE_BUY if compra else mt5.ORDER_TYPE_SELL, "magic": self.magic,
+                "deviation": self.desviacion_puntos, "type_filling": espec.filling, "type_time": mt5.ORDER_TIME_GTC,
+            }
+        return self._plantillas[clave]
+
+    def _precio_y_stops(self, espec, compra, dist_sl, dist_tp):
+        tick = mt5.symbol_info_tick(espec.name)
+        if tick is None: return None
+        precio = tick.ask if compra else tick.bid
+        minimo = (espec.stops_level + 1) * espec.point
+        dist_sl, dist_tp = max(dist_sl, minimo), max(dist_tp, minimo)
+        signo = 1 if compra else -1
+        return (precio, round(precio - signo * dist_sl, espec.digits), round(precio + signo * dist_tp, espec.digits))
+
+    def ejecutar(self, compra, symbol, dist_sl, dist_tp, t_senal=None):
+        """Envía una orden a mercado. Devuelve (OrderSendResult | None, Ejecucion | None)."""
+        t_senal = time.perf_counter() if t_senal is None else t_senal
+        espec, base = self.simbolos.obtener(symbol), self.plantilla(symbol, compra)
+        if espec is None or base is None: return None, None
+
+        res, intentos, t_envio = None, 0, 0.0
+        while intentos <= self.reintentos:
+            precios = self._precio_y_stops(espec, compra, dist_sl, dist_tp)
+            if precios is None: break
+            request = {**base, "price": precios[0], "sl": precios[1], "tp": precios[2]}
+            intentos += 1
+            t0 = time.perf_counter()
+            with METRICAS.span("order_send", symbol): res = mt5.order_send(request)
+            t_envio += time.perf_counter() - t0
+            if res is None or res.retcode not in RETCODES_RECOTIZACION: break
+            METRICAS.incrementar("recotizaciones", symbol=symbol)
+
+        if res is None: return None, None
+        t_fin = time.perf_counter()
+        ok = res.retcode == mt5.TRADE_RETCODE_DONE
+        lleno = res.price if ok and res.price else None
+        desliz = round((lleno - precios[0]) / espec.point * (1 if compra else -1), 1) if lleno else None
+        ejec = Ejecucion(res.order if ok else None, symbol, "BUY" if compra else "SELL", res.volume or base["volume"],
+                         precios[0], lleno, desliz, round((t_fin - t_senal) * 1000, 2), round(t_envio * 1000, 2),
+                         intentos, res.retcode, res.comment, datetime.now())
+        if ok:
+            METRICAS.observar("senal_a_ejecucion", t_fin - t_senal, symbol)
+            METRICAS.incrementar("ordenes", symbol=symbol)
+        else:
+            METRICAS.incrementar("ordenes_rechazadas", symbol=symbol)
+        return res, ejec
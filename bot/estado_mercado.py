@@ -0,0 +1,35 @@
+import time, threading
+
+# ==========================================
+# ESTADO DE MERCADO COMPARTIDO
+# ==========================================
+# La evaluación de señales publica el ATR (300 velas) y el planificador los ticks que ya sondea;
+# la protección los lee aquí en vez de volver a pedir velas al terminal.
+
+class EstadoMercado:
+    def __init__(self, ttl_atr=60.0, ttl_precio=2.0):
+        self.ttl_atr, self.ttl_precio = ttl_atr, ttl_precio
+        self._atr, self._precios, self._lock = {}, {}, threading.Lock()
+
+    def publicar_indicadores(self, symbol, atr, close, vela):
+        with self._lock: self._atr[symbol] = (float(atr), float(close), int(vela), time.monotonic())
+
+    def publicar_tick(self, symbol, bid, ask, time_msc):
+        with self._lock: self._precios[symbol] = (float(bid), float(ask), int(time_msc), time.monotonic())
+
+    def atr(self, symbol):
+        """ATR vigente o None si no hay dato fresco"""
+        with self._lock: dato = self._atr.get(symbol)
+        if dato is None or time.monotonic() - dato[3] > self.ttl_atr: return None
+        return dato[0]
+
+    def precios(self, symbol):
+        """(bid, ask) vigentes o None"""
+        with self._lock: dato = self._precios.get(symbol)
+        if dato is None or time.monotonic() - dato[3] > self.ttl_precio: return None
+        return dato[0], dato[1]
+
+    def simbolos(self):
+        with self._lock: return set(self._atr)
+
+MERCADO = EstadoMercado()
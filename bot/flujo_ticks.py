@@ -0,0 +1,88 @@
+import time, threading
+import numpy as np
+import MetaTrader5 as mt5
+from metricas import METRICAS
+
+# ==========================================
+# INGESTA DE TICKS PARA PROTECCIÓN SUB-SEGUNDO
+# ==========================================
+# Un hilo pide con copy_ticks_from solo los ticks nuevos de los símbolos con posición abierta,
+# los guarda en un anillo por símbolo y avisa a `al_tick(symbol, anillo)` para que la
+# protección (BE / trailing) se evalúe a cadencia de tick sin volver a pedir velas.
+
+class AnilloTicks:
+    def __init__(self, capacidad=4096):
+        self.capacidad, self.total = capacidad, 0
+        self.time_msc = np.zeros(capacidad, dtype=np.int64)
+        self.bid = np.zeros(capacidad)
+        self.ask = np.zeros(capacidad)
+
+    def agregar(self, ticks):
+        """Inserta un array estructurado de copy_ticks_* de forma vectorizada"""
+        n = len(ticks)
+        if n > self.capacidad: ticks, n = ticks[-self.capacidad:], self.capacidad
+        idx = (self.total + np.arange(n)) % self.capacidad
+        self.time_msc[idx], self.bid[idx], self.ask[idx] = ticks['time_msc'], ticks['bid'], ticks['ask']
+        self.total += n
+
+    def ultimo(self):
+        i = (self.total - 1) % self.capacidad
+        return int(self.time_msc[i]), float(self.bid[i]), float(self.ask[i])
+
+    def ultimos(self, n):
+        """(time_msc, bid, ask) de los n ticks más recientes en orden cronológico"""
+        n = min(n, self.total, self.capacidad)
+        idx = (self.total - n + np.arange(n)) % self.capacidad
+        return self.time_msc[idx], self.bid[idx], self.ask[idx]
+
+class FlujoTicks:
+    def __init__(self, al_tick, capacidad=4096, intervalo=0.1, lote=1000):
+        self.al_tick, self.capacidad, self.intervalo, self.lote = al_tick, capacidad, intervalo, lote
+        self.anillos, self._ultimo_msc, self._vigilados = {}, {}, set()
+        self._lock, self._parar = threading.Lock(), threading.Event()
+
+    def vigilar(self, simbolos):
+        """Solo se ingieren ticks de estos símbolos (los que tienen posición abierta)"""
+        simbolos = set(simbolos)
+        with self._lock:
+            for s in self._vigilados - simbolos:
+                self.anillos.pop(s, None); self._ultimo_msc.pop(s, None)
+            self._vigilados = simbolos
+
+    def _nuevos(self, s):
+        desde = self._ultimo_msc.get(s)
+        if desde is None:
+            tick = mt5.symbol_info_tick(s)
+            if tick is None: return None
+            desde = tick.time_msc - 1
+        ticks = mt5.copy_ticks_from(s, int(desde // 1000), self.lote, mt5.COPY_TICKS_INFO)
+        if ticks is None or len(ticks) == 0: return None
+        ticks = ticks[ticks['time_msc'] > desde]  # La consulta es por segundo: descartar repetidos
+        return ticks if len(ticks) else None
+
+    def sondear(self):
+        with self._lock: vigilados = list(self._vigilados)
+        for s in vigilados:
+            with METRICAS.span("ticks_copia", s):
+                ticks = self._nuevos(s)
+            if ticks is None: continue
+            with self._lock:
+                if s not in self._vigilados: continue
+                anillo = self.anillos.setdefault(s, AnilloTicks(self.capacidad))
+                anillo.agregar(ticks)
+                self._ultimo_msc[s] = int(ticks['time_msc'][-1])
+            METRICAS.incrementar("ticks_recibidos", len(ticks), symbol=s)
+            with METRICAS.span("ticks_proteccion", s): self.al_tick(s, anillo)
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            t0 = time.monotonic()
+            try: self.sondear()
+            except Exception as e: print(f"Error ticks: {e}")
+            self._parar.wait(max(self.intervalo - (time.monotonic() - t0), 0))
+
+    def iniciar(self):
+        threading.Thread(target=self._bucle, daemon=True, name="ticks").start()
+
+    def detener(self):
+        self._parar.set()
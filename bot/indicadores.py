@@ -0,0 +1,46 @@
+import math
+import pandas as pd
+import pandas_ta as ta
+
+# Definición única de indicadores: la comparten entrenamiento, bucle en vivo y optimizador
+FEATURES = ['rsi', 'ema_l', 'ema_r', 'volatilidad']
+HORIZONTE_TARGET = 3  # Velas hacia adelante que predice la IA
+LONGITUD_RSI, LONGITUD_ATR, EMA_LARGA, EMA_RAPIDA = 14, 14, 200, 50
+ESTADO = ['rsi_sube', 'rsi_baja']  # Medias de Wilder del RSI: no se deducen de las columnas publicadas
+
+def calcular_indicadores(df):
+    """Añade rsi, ema_l, ema_r, volatilidad y atr a un DataFrame de velas MT5"""
+    df['rsi'] = ta.rsi(df['close'], length=LONGITUD_RSI)
+    df['ema_l'], df['ema_r'] = ta.ema(df['close'], EMA_LARGA), ta.ema(df['close'], EMA_RAPIDA)
+    df['volatilidad'] = df['high'] - df['low']
+    df['atr'] = ta.atr(df['high'], df['low'], df['close'], length=LONGITUD_ATR)
+    return df
+
+def calcular_estado(df):
+    """Añade ESTADO (RMA de subidas/bajadas, como ta.rsi) para poder avanzar una vela con paso_indicadores"""
+    d = df['close'].diff()
+    df['rsi_sube'] = d.clip(lower=0).ewm(alpha=1 / LONGITUD_RSI, min_periods=LONGITUD_RSI).mean()
+    df['rsi_baja'] = (-d.clip(upper=0)).ewm(alpha=1 / LONGITUD_RSI, min_periods=LONGITUD_RSI).mean()
+    return df
+
+def paso_indicadores(previa, vela):
+    """Indicadores de `vela` por recursión de un paso desde la fila anterior ya calculada (indicadores +
+    ESTADO): mismas fórmulas que calcular_indicadores sin recorrer la serie. Devuelve la fila nueva."""
+    c, h, l, c_prev = float(vela['close']), float(vela['high']), float(vela['low']), float(previa['close'])
+    d = c - c_prev
+    sube = previa['rsi_sube'] + (max(d, 0.0) - previa['rsi_sube']) / LONGITUD_RSI
+    baja = previa['rsi_baja'] + (max(-d, 0.0) - previa['rsi_baja']) / LONGITUD_RSI
+    tr = max(h - l, abs(h - c_prev), abs(l - c_prev))
+    fila = {k: float(vela[k]) for k in (vela.dtype.names if hasattr(vela, 'dtype') else vela.keys())}
+    fila.update(rsi=100 * sube / (sube + baja) if sube + baja else math.nan,
+                ema_l=previa['ema_l'] + (c - previa['ema_l']) * 2 / (EMA_LARGA + 1),
+                ema_r=previa['ema_r'] + (c - previa['ema_r']) * 2 / (EMA_RAPIDA + 1),
+                volatilidad=h - l, atr=previa['atr'] + (tr - previa['atr']) / LONGITUD_ATR,
+                rsi_sube=sube, rsi_baja=baja)
+    return pd.Series(fila)
+
+def calcular_target(df):
+    return (df['close'].shift(-HORIZONTE_TARGET) > df['close']).astype(int)
+
+def velas_a_dataframe(rates):
+    return calcular_indicadores(pd.DataFrame(rates))
@@ -0,0 +1,129 @@
+import time, threading
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# MÉTRICAS DEL BUCLE (histogramas + contadores, formato Prometheus)
+# ==========================================
+# Uso:  with METRICAS.span("velas", symbol): rates = mt5.copy_rates_from_pos(...)
+# Exportación: METRICAS.iniciar_servidor(9108) -> http://127.0.0.1:9108/metrics
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histograma:
+    def __init__(self):
+        self.cuentas = [0] * (len(BUCKETS) + 1)  # Último = +Inf
+        self.suma, self.total, self.ultimo = 0.0, 0, 0.0
+
+    def observar(self, v):
+        i = 0
+        while i < len(BUCKETS) and v > BUCKETS[i]: i += 1
+        self.cuentas[i] += 1
+        self.suma += v; self.total += 1; self.ultimo = v
+
+    def percentil(self, q):
+        """Estimación por interpolación lineal dentro del bucket (como histogram_quantile)"""
+        if not self.total: return 0.0
+        objetivo, acumulado = q * self.total, 0
+        for i, c in enumerate(self.cuentas):
+            if acumulado + c >= objetivo:
+                if i == len(BUCKETS): return BUCKETS[-1]
+                inferior = BUCKETS[i - 1] if i else 0.0
+                return inferior + (BUCKETS[i] - inferior) * ((objetivo - acumulado) / c if c else 0)
+            acumulado += c
+        return BUCKETS[-1]
+
+class Metricas:
+    def __init__(self, prefijo="traderbot"):
+        self.prefijo, self._lock = prefijo, threading.Lock()
+        self._hist = defaultdict(Histograma)       # (etapa, symbol) -> Histograma
+        self._contadores = defaultdict(float)      # (nombre, symbol) -> valor
+        self._gauges = {}                          # nombre -> valor
+
+    def observar(self, etapa, segundos, symbol=""):
+        with self._lock: self._hist[(etapa, symbol)].observar(segundos)
+
+    @contextmanager
+    def span(self, etapa, symbol=""):
+        t0 = time.perf_counter()
+        try: yield
+        finally: self.observar(etapa, time.perf_counter() - t0, symbol)
+
+    def cronometrar(self, etapa, fn, *args, **kwargs):
+        """Ejecuta fn midiendo su duración (para tareas enviadas a pools de hilos)"""
+        with self.span(etapa): return fn(*args, **kwargs)
+
+    def incrementar(self, nombre, valor=1, symbol=""):
+        with self._lock: self._contadores[(nombre, symbol)] += valor
+
+    def fijar(self, nombre, valor):
+        with self._lock: self._gauges[nombre] = valor
+
+    def exportar_prometheus(self):
+        p, lineas = self.prefijo, []
+        with self._lock:
+            lineas.append(f"# HELP {p}_etapa_segundos Duración de cada etapa del bucle")
+            lineas.append(f"# TYPE {p}_etapa_segundos histogram")
+            for (etapa, symbol), h in sorted(self._hist.items()):
+                etq = f'etapa="{etapa}"' + (f',symbol="{symbol}"' if symbol else "")
+                acumulado = 0
+                for limite, c in zip(BUCKETS, h.cuentas):
+                    acumulado += c
+                    lineas.append(f'{p}_etapa_segundos_bucket{{{etq},le="{limite}"}} {acumulado}')
+                lineas.append(f'{p}_etapa_segundos_bucket{{{etq},le="+Inf"}} {h.total}')
+                lineas.append(f"{p}_etapa_segundos_sum{{{etq}}} {h.suma:.6f}")
+                lineas.append(f"{p}_etapa_segundos_count{{{etq}}} {h.total}")
+            for nombre in sorted({n for n, _ in self._contadores}):
+                lineas.append(f"# TYPE {p}_{nombre}_total counter")
+                for (n, symbol), v in sorted(self._contadores.items()):
+                    if n == nombre:
+                        etq = f'{{symbol="{symbol}"}}' if symbol else ""
+                        lineas.append(f"{p}_{nombre}_total{etq} {v:g}")
+            for nombre, v in sorted(self._gauges.items()):
+                lineas.append(f"# TYPE {p}_{nombre} gauge")
+                lineas.append(f"{p}_{nombre} {v:g}")
+        return "\n".join(lineas) + "\n"
+
+    def resumen(self):
+        """Agregado por etapa (todas los símbolos juntos) para bot_status, en milisegundos"""
+        with self._lock:
+            por_etapa = defaultdict(Histograma)
+            for (etapa, _), h in self._hist.items():
+                agg = por_etapa[etapa]
+                agg.cuentas = [a + b for a, b in zip(agg.cuentas, h.cuentas)]
+                agg.suma += h.suma; agg.total += h.total
+                agg.ultimo = max(agg.ultimo, h.ultimo) if etapa != "ciclo" else h.ultimo
+            etapas = {e: {"n": h.total, "media_ms": round(h.suma / h.total * 1000, 2) if h.total else 0.0,
+                          "p50_ms": round(h.percentil(0.5) * 1000, 2), "p95_ms": round(h.percentil(0.95) * 1000, 2),
+                          "p99_ms": round(h.percentil(0.99) * 1000, 2)} for e, h in sorted(por_etapa.items())}
+            contadores = defaultdict(float)
+            for (n, _), v in self._contadores.items(): contadores[n] += v
+            # Latencia evento -> evaluación terminada (vela y tick juntos), la que registra el Planificador
+            evaluacion = Histograma()
+            for e in ("latencia_evento_vela", "latencia_evento_tick"):
+                if e not in por_etapa: continue
+                h = por_etapa[e]
+                evaluacion.cuentas = [a + b for a, b in zip(evaluacion.cuentas, h.cuentas)]
+                evaluacion.suma += h.suma; evaluacion.total += h.total
+            return {"etapas": etapas, "contadores": dict(contadores), "gauges": dict(self._gauges),
+                    "latencia_evaluacion_p95_ms": round(evaluacion.percentil(0.95) * 1000, 2),
+                    "ultimo_mantenimiento_ms": round(por_etapa["mantenimiento"].ultimo * 1000, 2) if "mantenimiento" in por_etapa else 0.0}
+
+    def iniciar_servidor(self, puerto, host="127.0.0.1"):
+        metricas = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("/metrics", ""):
+                    self.send_response(404); self.end_headers(); return
+                cuerpo = metricas.exportar_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers(); self.wfile.write(cuerpo)
+            def log_message(self, *args): pass  # Sin ruido en la consola del bot
+        servidor = ThreadingHTTPServer((host, puerto), Handler)
+        threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas-http").start()
+        return servidor
+
+METRICAS = Metricas()
@@ -0,0 +1,172 @@
+import math
+from datetime import datetime
+
+# ==========================================
+# MÉTRICAS DE RIESGO INCREMENTALES
+# ==========================================
+# Estado O(1) que se actualiza con cada trade sincronizado, cada equity de la cuenta y cada foto de
+# live_positions, en lugar de recorrer `trades` en cada petición. Lo persiste DatabaseManager en
+# risk_state (estado interno + resumen que sirve /stats/risk).
+# - Drawdown sobre la equity NETA de depósitos/retiros (trades BALANCE): un ingreso no es un nuevo
+#   pico de rentabilidad y un retiro no es una pérdida.
+# - Conciliación: con el balance de la cuenta, una muestra cuyo salto de balance no cuadra con los deals
+#   ya registrados (depósito que aún no llegó por history_deals o al revés) no mueve pico ni drawdown;
+#   tras MAX_SIN_CONCILIAR muestras seguidas la diferencia se toma como aporte.
+# - Retorno de un trade = profit / equity antes del trade. Momentos acumulados con Welford y móviles
+#   con media/varianza exponencial (VENTANA_MOVIL trades de vida media aproximada); el Sharpe móvil
+#   no se publica hasta tener VENTANA_MOVIL // 2 retornos (la EWMA arranca con el primero).
+
+VENTANA_MOVIL = 50
+MAX_SIN_CONCILIAR = 3
+
+class MetricasRiesgo:
+    CAMPOS = ("aportes", "equity", "pico", "dd", "dd_max", "dd_max_pct", "dd_max_fecha",
+              "trades", "ganadores", "ganancia_bruta", "perdida_bruta", "n_ret", "media", "m2",
+              "ew_media", "ew_var", "exposicion", "actualizado", "calibrar", "saldo", "pendiente", "sin_conciliar")
+
+    def __init__(self, ventana=VENTANA_MOVIL):
+        self.alfa = 2 / (ventana + 1)
+        self.aportes = 0.0                          # Depósitos - retiros acumulados
+        self.equity = None                          # Última equity real conocida
+        self.pico, self.dd, self.dd_max, self.dd_max_pct, self.dd_max_fecha = None, 0.0, 0.0, 0.0, None
+        self.trades, self.ganadores, self.ganancia_bruta, self.perdida_bruta = 0, 0, 0.0, 0.0
+        self.n_ret, self.media, self.m2 = 0, 0.0, 0.0
+        self.ew_media, self.ew_var = 0.0, 0.0
+        self.exposicion, self.actualizado = {}, None
+        self.calibrar = False                       # Tras reconstruir: ajustar aportes con la 1ª equity real
+        self.saldo, self.pendiente = None, 0.0      # Último balance conciliado y deals registrados desde entonces
+        self.sin_conciliar = 0
+
+    # --- Entradas ---
+
+    def registrar_equity(self, equity, cuando=None, balance=None):
+        if self.calibrar:
+            # Lo que la curva de trades no explica (histórico incompleto, flotante) se trata como aporte
+            if self.equity is not None: self.aportes += float(equity) - self.equity
+            self.calibrar, self.saldo = False, None
+        self.equity = float(equity)
+        if balance is not None and not self._conciliar(float(balance)):
+            self.actualizado = _fecha(cuando)
+            return
+        neta = self.equity - self.aportes
+        if self.pico is None or neta > self.pico: self.pico = neta
+        self.dd = self.pico - neta
+        if self.dd > self.dd_max:
+            real = self.pico + self.aportes  # Equity real en el pico, con los aportes actuales
+            self.dd_max, self.dd_max_pct = self.dd, (self.dd / real * 100 if real > 0 else 0.0)
+            self.dd_max_fecha = _fecha(cuando)
+        self.actualizado = _fecha(cuando)
+
+    def registrar_trade(self, symbol, profit, cuando=None):
+        profit = float(profit)
+        self.pendiente += profit
+        if symbol == "BALANCE":
+            self.aportes += profit
+            self.actualizado = _fecha(cuando)
+            return
+        self.trades += 1
+        if profit > 0: self.ganadores += 1; self.ganancia_bruta += profit
+        else: self.perdida_bruta -= profit
+        base = (self.equity - profit) if self.equity else None  # La equity ya puede incluir el cierre
+        if base and base > 0:
+            r = profit / base
+            self.n_ret += 1
+            delta = r - self.media
+            self.media += delta / self.n_ret
+            self.m2 += delta * (r - self.media)
+            if self.n_ret == 1: self.ew_media, self.ew_var = r, 0.0
+            else:
+                d = r - self.ew_media
+                self.ew_media += self.alfa * d
+                self.ew_var = (1 - self.alfa) * (self.ew_var + self.alfa * d * d)
+        self.actualizado = _fecha(cuando)
+
+    def registrar_cuenta(self, deals, equity, balance, cuando=None):
+        """Una foto de la cuenta: deals nuevos [(cuando, symbol, profit)] ordenados y la equity/balance leídos
+        DESPUÉS de pedirlos. La equity tras cada deal se deduce hacia atrás desde la actual."""
+        resto = sum(float(p) for _, _, p in deals)
+        for t, sym, profit in deals:
+            resto -= float(profit)
+            if self.calibrar: self.equity = (self.equity or 0.0) + float(profit)  # Aún sobre la curva reconstruida
+            else: self.equity = float(equity) - resto
+            self.registrar_trade(sym, profit, t)
+        self.registrar_equity(equity, cuando, balance)
+
+    def registrar_posiciones(self, posiciones, cuando=None):
+        """posiciones: [(symbol, tipo 'BUY'/'SELL', lotes, profit flotante)]; sustituye la foto anterior"""
+        exp = {}
+        for sym, tipo, lotes, profit in posiciones:
+            e = exp.setdefault(sym, {"lotes": 0.0, "brutos": 0.0, "posiciones": 0, "profit": 0.0})
+            e["lotes"] += lotes if tipo == "BUY" else -lotes
+            e["brutos"] += lotes; e["posiciones"] += 1; e["profit"] += profit
+        self.exposicion = {s: {k: (round(v, 2) if isinstance(v, float) else v) for k, v in e.items()} for s, e in exp.items()}
+        self.actualizado = _fecha(cuando)
+
+    def _conciliar(self, balance):
+        """True si el salto de balance desde el último conciliado lo explican los deals registrados"""
+        if self.saldo is not None:
+            diferencia = balance - self.saldo - self.pendiente
+            if abs(diferencia) > max(1.0, abs(balance) * 0.001):
+                self.sin_conciliar += 1
+                if self.sin_conciliar < MAX_SIN_CONCILIAR: return False
+                self.aportes += diferencia  # Ningún deal lo explica: movimiento de fondos no visto
+        self.saldo, self.pendiente, self.sin_conciliar = balance, 0.0, 0
+        return True
+
+    # --- Salidas ---
+
+    @property
+    def ventana(self):
+        return round(2 / self.alfa - 1)
+
+    def resumen(self):
+        std = math.sqrt(self.m2 / (self.n_ret - 1)) if self.n_ret > 1 else 0.0
+        ew_std = math.sqrt(self.ew_var)
+        pico_real = self.pico + self.aportes if self.pico is not None else None
+        return {
+            "equity": _r(self.equity), "peak_equity": _r(pico_real),
+            "drawdown": round(self.dd, 2), "drawdown_pct": round(self.dd / pico_real * 100, 2) if pico_real else 0.0,
+            "max_drawdown": round(self.dd_max, 2), "max_drawdown_pct": round(self.dd_max_pct, 2),
+            "max_drawdown_at": self.dd_max_fecha,
+            "trades": self.trades,
+            "win_rate": round(self.ganadores / self.trades * 100, 2) if self.trades else 0.0,
+            "profit_factor": round(self.ganancia_bruta / self.perdida_bruta, 3) if self.perdida_bruta else None,
+            "expectancy": round((self.ganancia_bruta - self.perdida_bruta) / self.trades, 2) if self.trades else 0.0,
+            "return_mean_pct": round(self.media * 100, 4), "return_std_pct": round(std * 100, 4),
+            "sharpe_trade": round(self.media / std, 3) if std > 0 else None,
+            "sharpe_rolling": round(self.ew_media / ew_std, 3) if ew_std > 0 and self.n_ret >= self.ventana // 2 else None,
+            "rolling_window": self.ventana,
+            "exposure": self.exposicion,
+            "gross_lots": round(sum(e["brutos"] for e in self.exposicion.values()), 2),
+            "floating_profit": round(sum(e["profit"] for e in self.exposicion.values()), 2),
+            "updated_at": self.actualizado,
+        }
+
+    def a_dict(self):
+        return {"alfa": self.alfa, **{c: getattr(self, c) for c in self.CAMPOS}}
+
+    @classmethod
+    def desde_dict(cls, d):
+        m = cls()
+        m.alfa = d.get("alfa", m.alfa)
+        for c in cls.CAMPOS:
+            if c in d: setattr(m, c, d[c])
+        return m
+
+    @classmethod
+    def reconstruir(cls, trades):
+        """Desde el histórico [(symbol, profit, close_time)] ordenado: la curva de balance hace de equity"""
+        m, saldo = cls(), 0.0
+        for sym, profit, cuando in trades:
+            m.equity = saldo + float(profit)  # Equity tras el cierre, como la vería registrar_equity
+            m.registrar_trade(sym, profit, cuando)
+            saldo += float(profit)
+            m.registrar_equity(saldo, cuando)
+        m.calibrar = True
+        return m
+
+def _fecha(cuando):
+    return (cuando or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+
+def _r(v):
+    return round(v, 2) if v is not None else None
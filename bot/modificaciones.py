@@ -0,0 +1,86 @@
+import time, threading
+import MetaTrader5 as mt5
+from metricas import METRICAS
+from ejecucion import TablaSimbolos
+
+# ==========================================
+# GESTOR DE MODIFICACIONES SL/TP
+# ==========================================
+# Filtra las peticiones TRADE_ACTION_SLTP antes de llegar al bróker:
+#  - paso mínimo (en puntos o fracción de ATR) respecto al último SL aceptado,
+#  - respeta trade_stops_level / trade_freeze_level del símbolo,
+#  - límite de frecuencia por posición y una sola petición en vuelo por ticket,
+#  - registra el retcode y hace back-off tras un rechazo.
+
+class GestorModificaciones:
+    def __init__(self, paso_min_puntos=5, paso_min_atr=0.05, intervalo_min=10.0, margen_stops_puntos=2,
+                 espera_rechazo=30.0, simbolos=None):
+        self.paso_min_puntos, self.paso_min_atr = paso_min_puntos, paso_min_atr
+        self.intervalo_min, self.margen_stops_puntos = intervalo_min, margen_stops_puntos
+        self.espera_rechazo, self.simbolos = espera_rechazo, simbolos or TablaSimbolos()
+        self._ultimo_envio, self._en_vuelo, self._confirmado, self._bloqueo = {}, {}, {}, {}
+        self._lock = threading.Lock()
+
+    def sl_vigente(self, p):
+        """SL efectivo: el de la posición o el último confirmado si la foto aún no lo refleja"""
+        confirmado = self._confirmado.get(p.ticket)
+        if not confirmado: return p.sl
+        if not p.sl: return confirmado
+        return max(p.sl, confirmado) if p.type == 0 else min(p.sl, confirmado)
+
+    def decidir(self, p, nuevo_sl, atr, forzar=False, precio=None, ahora=None):
+        """Devuelve (sl_a_enviar | None, motivo). `forzar` salta el límite de frecuencia y el paso mínimo (break-even)."""
+        info = self.simbolos.obtener(p.symbol)
+        if info is None: return None, "sin_simbolo"
+        ahora = time.monotonic() if ahora is None else ahora
+        if p.ticket in self._en_vuelo: return None, "en_vuelo"
+        if ahora < self._bloqueo.get(p.ticket, 0): return None, "bloqueado"
+        if not forzar and ahora - self._ultimo_envio.get(p.ticket, float("-inf")) < self.intervalo_min:
+            return None, "frecuencia"
+
+        compra, point, actual = p.type == 0, info.point, self.sl_vigente(p)
+        precio = p.price_current if precio is None else precio
+        if info.freeze_level and actual and abs(precio - actual) <= info.freeze_level * point:
+            return None, "congelado"
+        distancia_min = (info.stops_level + self.margen_stops_puntos) * point
+        nuevo = min(nuevo_sl, precio - distancia_min) if compra else max(nuevo_sl, precio + distancia_min)
+        nuevo = round(nuevo, info.digits)
+
+        if not actual: return nuevo, "ok"
+        mejora = (nuevo - actual) if compra else (actual - nuevo)
+        if mejora <= 0: return None, "sin_mejora"
+        if not forzar and mejora < max(self.paso_min_puntos * point, self.paso_min_atr * atr):
+            return None, "paso_minimo"
+        return nuevo, "ok"
+
+    def solicitar(self, p, nuevo_sl, atr, forzar=False, precio=None):
+        """Decide y, si procede, envía la modificación. Devuelve True si el bróker la aceptó."""
+        with self._lock:
+            sl, motivo = self.decidir(p, nuevo_sl, atr, forzar, precio)
+            if sl is None:
+                METRICAS.incrementar(f"sltp_omitidas_{motivo}")
+                return False
+            self._en_vuelo[p.ticket] = sl
+            self._ultimo_envio[p.ticket] = time.monotonic()
+
+        request = {"action": mt5.TRADE_ACTION_SLTP, "position": p.ticket, "symbol": p.symbol, "sl": sl, "tp": p.tp}
+        try:
+            with METRICAS.span("order_send_sltp", p.symbol): res = mt5.order_send(request)
+        finally:
+            with self._lock: self._en_vuelo.pop(p.ticket, None)
+        retcode = res.retcode if res is not None else None
+        METRICAS.incrementar("modificaciones_sltp", symbol=p.symbol)
+
+        with self._lock:
+            if retcode in (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_NO_CHANGES):
+                self._confirmado[p.ticket] = sl
+                return True
+            self._bloqueo[p.ticket] = time.monotonic() + self.espera_rechazo
+        METRICAS.incrementar(f"sltp_rechazo_{retcode}", symbol=p.symbol)
+        return False
+
+    def purgar(self, tickets_abiertos):
+        """Olvida el estado de posiciones ya cerradas"""
+        with self._lock:
+            for d in (self._ultimo_envio, self._confirmado, self._bloqueo):
+                for t in [t for t in d if t not in tickets_abiertos]: del d[t]
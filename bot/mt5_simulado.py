@@ -0,0 +1,409 @@
+import sys, time, zlib, threading
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from datetime import datetime
+
+# ==========================================
+# SIMULADOR LOCAL DE METATRADER5
+# ==========================================
+# Sustituto "drop-in" del paquete MetaTrader5 para correr y medir el bot en Linux:
+#   import mt5_simulado; mt5_simulado.instalar()   # antes de importar tradingbot_ia
+#   mt5_simulado.generar_sintetico(["EURUSD", "XAUUSD"], n_barras=3000)
+# Velas grabadas: mt5_simulado.cargar_csv("EURUSD", "EURUSD.csv") (columnas de copy_rates).
+# El reloj es simulado: avanzar(segundos) mueve el mercado, comprueba SL/TP y genera deals.
+# Cada llamada de la API puede añadir latencia real configurable (LATENCIAS, en segundos).
+
+# --- Constantes (mismos valores que el paquete oficial) ---
+TIMEFRAME_M1, TIMEFRAME_M5, TIMEFRAME_M15, TIMEFRAME_M30 = 1, 5, 15, 30
+TIMEFRAME_H1, TIMEFRAME_H4, TIMEFRAME_D1 = 16385, 16388, 16408
+SEGUNDOS_TIMEFRAME = {1: 60, 5: 300, 15: 900, 30: 1800, 16385: 3600, 16388: 14400, 16408: 86400}
+ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+POSITION_TYPE_BUY, POSITION_TYPE_SELL = 0, 1
+TRADE_ACTION_DEAL, TRADE_ACTION_SLTP = 1, 6
+ORDER_FILLING_FOK, ORDER_FILLING_IOC, ORDER_FILLING_RETURN = 0, 1, 2
+ORDER_TIME_GTC = 0
+DEAL_TYPE_BUY, DEAL_TYPE_SELL, DEAL_TYPE_BALANCE = 0, 1, 2
+DEAL_ENTRY_IN, DEAL_ENTRY_OUT = 0, 1
+COPY_TICKS_ALL, COPY_TICKS_INFO, COPY_TICKS_TRADE = -1, 1, 2
+SYMBOL_TRADE_MODE_DISABLED, SYMBOL_TRADE_MODE_FULL = 0, 4
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_PRICE_OFF = 10021
+TRADE_RETCODE_NO_CHANGES = 10025
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+# --- Estructuras devueltas (mismos campos que las del terminal) ---
+AccountInfo = namedtuple("AccountInfo", "login balance equity profit margin margin_free leverage currency server")
+TerminalInfo = namedtuple("TerminalInfo", "connected trade_allowed name path")
+SymbolInfo = namedtuple("SymbolInfo", "name visible select trade_mode spread bid ask digits point filling_mode "
+                                      "volume_min volume_max volume_step trade_stops_level trade_freeze_level "
+                                      "trade_contract_size trade_tick_value trade_tick_size path description")
+Tick = namedtuple("Tick", "time bid ask last volume time_msc flags volume_real")
+TradePosition = namedtuple("TradePosition", "ticket time time_msc type magic identifier volume price_open "
+                                            "sl tp price_current swap profit symbol comment")
+TradeDeal = namedtuple("TradeDeal", "ticket order time time_msc type entry magic position_id reason volume "
+                                    "price commission swap profit fee symbol comment")
+OrderSendResult = namedtuple("OrderSendResult", "retcode deal order volume price bid ask comment request_id request")
+
+DTYPE_RATES = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                        ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')])
+DTYPE_TICKS = np.dtype([('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+                        ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')])
+TICK_FLAG_BID, TICK_FLAG_ASK = 2, 4
+
+# Latencia artificial por llamada (segundos). "*" aplica a las no listadas.
+LATENCIAS = {"*": 0.0}
+ESTADISTICAS = {}  # nombre -> [llamadas, segundos]
+SEGUNDOS_POR_TICK = 1
+_lock = threading.RLock()
+
+# ==========================================
+# ESTADO DEL MERCADO Y DE LA CUENTA
+# ==========================================
+
+class _Simbolo:
+    def __init__(self, name, rates, digits, spread_pts, contract_size, stops_level, volume_min, volume_step):
+        self.name, self.rates, self.digits = name, rates, digits
+        self.point = 10.0 ** -digits
+        self.spread_pts, self.contract_size, self.stops_level = spread_pts, contract_size, stops_level
+        self.volume_min, self.volume_step = volume_min, volume_step
+        self.visible, self._ticks = True, {}
+
+    def indice(self, t):
+        """Índice de la vela en formación en el instante t"""
+        return int(np.searchsorted(self.rates['time'], t, side='right')) - 1
+
+    def camino_vela(self, k):
+        """Precios bid por segundo dentro de la vela k: puente browniano open→close acotado a [low, high]"""
+        if k not in self._ticks:
+            r = self.rates[k]
+            n = max(int(SEGUNDOS_TIMEFRAME[_sim.timeframe] // SEGUNDOS_POR_TICK), 2)
+            rng = np.random.default_rng((zlib.crc32(self.name.encode()), k))
+            w = np.cumsum(rng.normal(0, 1, n)); w -= np.linspace(0, 1, n) * w[-1]
+            escala = (r['high'] - r['low']) / 4 or self.point
+            camino = np.linspace(r['open'], r['close'], n) + w / (np.abs(w).max() or 1) * escala
+            camino[0], camino[-1] = r['open'], r['close']
+            self._ticks[k] = np.round(np.clip(camino, r['low'], r['high']), self.digits)
+            if len(self._ticks) > 64: self._ticks.pop(next(iter(self._ticks)))
+        return self._ticks[k]
+
+    def bid(self, t):
+        k = self.indice(t)
+        camino = self.camino_vela(k)
+        pos = int((t - self.rates['time'][k]) // SEGUNDOS_POR_TICK)
+        return float(camino[min(pos, len(camino) - 1)])
+
+    def ask(self, t):
+        return round(self.bid(t) + self.spread_pts * self.point, self.digits)
+
+
+class _Simulador:
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self, balance=10000.0, timeframe=TIMEFRAME_H1):
+        self.simbolos, self.posiciones, self.deals = {}, {}, []
+        self.balance, self.timeframe, self.ahora = balance, timeframe, 0
+        self.prob_requote, self.slippage_pts, self.rng = 0.0, 0, np.random.default_rng(0)
+        self._ticket, self.inicializado, self._error = 1000, False, (1, "Success")
+        self.deals.append(TradeDeal(self._nuevo_ticket(), 0, 0, 0, DEAL_TYPE_BALANCE, DEAL_ENTRY_IN, 0, 0, 0, 0.0,
+                                    0.0, 0.0, 0.0, balance, 0.0, "", "deposit"))
+
+    def _nuevo_ticket(self):
+        self._ticket += 1
+        return self._ticket
+
+    def precio_cierre(self, s, tipo):
+        return s.bid(self.ahora) if tipo == POSITION_TYPE_BUY else s.ask(self.ahora)
+
+    def profit(self, p, precio):
+        s = self.simbolos[p.symbol]
+        signo = 1 if p.type == POSITION_TYPE_BUY else -1
+        return round(signo * (precio - p.price_open) * p.volume * s.contract_size, 2)
+
+    def cerrar(self, p, precio, razon=0):
+        del self.posiciones[p.ticket]
+        profit = self.profit(p, precio)
+        self.balance = round(self.balance + profit, 2)
+        d = TradeDeal(self._nuevo_ticket(), self._nuevo_ticket(), int(self.ahora), int(self.ahora * 1000),
+                      DEAL_TYPE_SELL if p.type == POSITION_TYPE_BUY else DEAL_TYPE_BUY, DEAL_ENTRY_OUT, p.magic,
+                      p.identifier, razon, p.volume, precio, 0.0, 0.0, profit, 0.0, p.symbol, "")
+        self.deals.append(d)
+        return d
+
+    def avanzar(self, segundos):
+        """Mueve el reloj recorriendo cada segundo simulado para disparar SL/TP en orden"""
+        fin = self.ahora + segundos
+        while self.ahora < fin:
+            self.ahora = min(self.ahora + SEGUNDOS_POR_TICK, fin)
+            for p in list(self.posiciones.values()):
+                s = self.simbolos[p.symbol]
+                precio = self.precio_cierre(s, p.type)
+                compra = p.type == POSITION_TYPE_BUY
+                if p.sl and ((compra and precio <= p.sl) or (not compra and precio >= p.sl)): self.cerrar(p, p.sl, 4)
+                elif p.tp and ((compra and precio >= p.tp) or (not compra and precio <= p.tp)): self.cerrar(p, p.tp, 5)
+
+    def vivas(self):
+        res = []
+        for p in self.posiciones.values():
+            precio = self.precio_cierre(self.simbolos[p.symbol], p.type)
+            res.append(p._replace(price_current=precio, profit=self.profit(p, precio)))
+        return res
+
+_sim = _Simulador()
+
+# ==========================================
+# CONFIGURACIÓN Y DATOS
+# ==========================================
+
+def instalar():
+    """Registra este módulo como 'MetaTrader5' para que `import MetaTrader5 as mt5` lo use"""
+    sys.modules["MetaTrader5"] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+def configurar(latencias=None, balance=None, timeframe=None, prob_requote=None, slippage_pts=None, semilla=None):
+    with _lock:
+        if balance is not None or timeframe is not None:
+            _sim.reiniciar(balance or _sim.balance, timeframe or _sim.timeframe)
+        if latencias is not None: LATENCIAS.clear(); LATENCIAS.update({"*": 0.0, **latencias})
+        if prob_requote is not None: _sim.prob_requote = prob_requote
+        if slippage_pts is not None: _sim.slippage_pts = slippage_pts
+        if semilla is not None: _sim.rng = np.random.default_rng(semilla)
+
+def agregar_simbolo(name, rates, digits=5, spread_pts=10, contract_size=100000, stops_level=0,
+                    volume_min=0.01, volume_step=0.01, visible=True):
+    """Registra velas (array estructurado o DataFrame con columnas de copy_rates) para un símbolo"""
+    if isinstance(rates, pd.DataFrame):
+        df = rates
+        rates = np.zeros(len(df), dtype=DTYPE_RATES)
+        for campo in DTYPE_RATES.names:
+            if campo in df: rates[campo] = df[campo].to_numpy()
+    with _lock:
+        s = _Simbolo(name, rates, digits, spread_pts, contract_size, stops_level, volume_min, volume_step)
+        s.visible = visible
+        _sim.simbolos[name] = s
+        # El reloj arranca en la última vela común a todos los símbolos
+        _sim.ahora = int(min(x.rates['time'][-1] for x in _sim.simbolos.values()))
+    return s
+
+def cargar_csv(name, ruta, **kw):
+    return agregar_simbolo(name, pd.read_csv(ruta), **kw)
+
+def generar_sintetico(nombres, n_barras=3000, futuras=48, precio=1.1, vol=0.002, digits=5, semilla=7, **kw):
+    """Velas de paseo aleatorio geométrico. El reloj queda al inicio de la vela n_barras;
+    las `futuras` velas siguientes se revelan al avanzar el reloj."""
+    paso = SEGUNDOS_TIMEFRAME[_sim.timeframe]
+    t0 = (int(time.time()) // paso) * paso - (n_barras - 1) * paso
+    total = n_barras + futuras
+    for i, name in enumerate(nombres):
+        rng = np.random.default_rng(semilla + i)
+        c = precio * np.exp(np.cumsum(rng.normal(0, vol, total)))
+        o = np.concatenate(([precio], c[:-1]))
+        rango = np.abs(rng.normal(0, vol, total)) * c
+        r = np.zeros(total, dtype=DTYPE_RATES)
+        r['time'] = t0 + paso * np.arange(total)
+        r['open'], r['close'] = np.round(o, digits), np.round(c, digits)
+        r['high'] = np.round(np.maximum(o, c) + rango, digits)
+        r['low'] = np.round(np.minimum(o, c) - rango, digits)
+        r['tick_volume'], r['spread'] = rng.integers(100, 5000, total), kw.get("spread_pts", 10)
+        agregar_simbolo(name, r, digits=digits, **kw)
+    with _lock: _sim.ahora = t0 + (n_barras - 1) * paso
+
+def avanzar(segundos):
+    with _lock: _sim.avanzar(segundos)
+
+def ahora():
+    return _sim.ahora
+
+def reiniciar_estadisticas():
+    ESTADISTICAS.clear()
+
+# ==========================================
+# API COMPATIBLE CON MetaTrader5
+# ==========================================
+
+def _api(fn):
+    nombre = fn.__name__
+    def envoltura(*args, **kwargs):
+        t0 = time.perf_counter()
+        espera = LATENCIAS.get(nombre, LATENCIAS.get("*", 0.0))
+        if espera: time.sleep(espera)
+        with _lock: res = fn(*args, **kwargs)
+        est = ESTADISTICAS.setdefault(nombre, [0, 0.0])
+        est[0] += 1; est[1] += time.perf_counter() - t0
+        return res
+    envoltura.__name__ = nombre
+    return envoltura
+
+def _segundos(fecha):
+    return int(fecha.timestamp()) if isinstance(fecha, datetime) else int(fecha)
+
+@_api
+def initialize(*args, **kwargs):
+    _sim.inicializado = True
+    return True
+
+@_api
+def shutdown():
+    _sim.inicializado = False
+
+@_api
+def last_error():
+    return _sim._error
+
+@_api
+def terminal_info():
+    return TerminalInfo(True, True, "MT5 Simulado", "")
+
+@_api
+def account_info():
+    vivas = _sim.vivas()
+    profit = round(sum(p.profit for p in vivas), 2)
+    return AccountInfo(5000001, _sim.balance, round(_sim.balance + profit, 2), profit, 0.0,
+                       round(_sim.balance + profit, 2), 100, "USD", "Simulado")
+
+def _info(s):
+    t = _sim.ahora
+    return SymbolInfo(s.name, s.visible, True, SYMBOL_TRADE_MODE_FULL, s.spread_pts, s.bid(t), s.ask(t), s.digits,
+                      s.point, 3, s.volume_min, 100.0, s.volume_step, s.stops_level, 0, s.contract_size,
+                      s.contract_size * s.point, s.point, f"Sim\\{s.name}", s.name)
+
+@_api
+def symbols_get(group=None):
+    return tuple(_info(s) for s in _sim.simbolos.values())
+
+@_api
+def symbols_total():
+    return len(_sim.simbolos)
+
+@_api
+def symbol_info(symbol):
+    s = _sim.simbolos.get(symbol)
+    return _info(s) if s else None
+
+@_api
+def symbol_select(symbol, enable=True):
+    s = _sim.simbolos.get(symbol)
+    if s: s.visible = enable
+    return s is not None
+
+@_api
+def symbol_info_tick(symbol):
+    s = _sim.simbolos.get(symbol)
+    if s is None: return None
+    t = _sim.ahora
+    return Tick(int(t), s.bid(t), s.ask(t), 0.0, 0, int(t * 1000), TICK_FLAG_BID | TICK_FLAG_ASK, 0.0)
+
+@_api
+def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+    s = _sim.simbolos.get(symbol)
+    if s is None or timeframe != _sim.timeframe:
+        _sim._error = (-2, "Invalid params"); return None
+    k = s.indice(_sim.ahora)
+    fin, ini = k + 1 - start_pos, max(k + 1 - start_pos - count, 0)
+    if fin <= 0: return None
+    rates = s.rates[ini:fin].copy()
+    if start_pos == 0:
+        # Vela en formación: high/low/close hasta el segundo actual
+        camino = s.camino_vela(k)[:int((_sim.ahora - s.rates['time'][k]) // SEGUNDOS_POR_TICK) + 1]
+        rates[-1]['high'], rates[-1]['low'], rates[-1]['close'] = camino.max(), camino.min(), camino[-1]
+    return rates
+
+def _ticks_desde(symbol, desde, count):
+    s = _sim.simbolos.get(symbol)
+    if s is None: return None
+    desde = max(desde, int(s.rates['time'][0]))
+    hasta = min(int(_sim.ahora), desde + (count - 1) * SEGUNDOS_POR_TICK)
+    tiempos = np.arange(desde - desde % SEGUNDOS_POR_TICK, hasta + 1, SEGUNDOS_POR_TICK)
+    ticks = np.zeros(len(tiempos), dtype=DTYPE_TICKS)
+    ticks['time'], ticks['time_msc'] = tiempos, tiempos * 1000
+    ticks['bid'] = [s.bid(t) for t in tiempos]
+    ticks['ask'] = np.round(ticks['bid'] + s.spread_pts * s.point, s.digits)
+    ticks['flags'] = TICK_FLAG_BID | TICK_FLAG_ASK
+    return ticks
+
+@_api
+def copy_ticks_from(symbol, date_from, count, flags=COPY_TICKS_ALL):
+    return _ticks_desde(symbol, _segundos(date_from), count)
+
+@_api
+def copy_ticks_range(symbol, date_from, date_to, flags=COPY_TICKS_ALL):
+    desde, hasta = _segundos(date_from), _segundos(date_to)
+    return _ticks_desde(symbol, desde, max(hasta - desde, 0) // SEGUNDOS_POR_TICK + 1)
+
+@_api
+def positions_total():
+    return len(_sim.posiciones)
+
+@_api
+def positions_get(symbol=None, ticket=None, group=None, magic=None):
+    res = [p for p in _sim.vivas() if (symbol is None or p.symbol == symbol) and (ticket is None or p.ticket == ticket)
+           and (magic is None or p.magic == magic)]
+    return tuple(res)
+
+@_api
+def history_deals_get(*args, position=None, ticket=None, group=None):
+    if position is not None: return tuple(d for d in _sim.deals if d.position_id == position)
+    if ticket is not None: return tuple(d for d in _sim.deals if d.ticket == ticket)
+    if len(args) >= 2:
+        desde, hasta = _segundos(args[0]), _segundos(args[1])
+        return tuple(d for d in _sim.deals if desde <= d.time <= hasta or d.type == DEAL_TYPE_BALANCE)
+    return tuple(_sim.deals)
+
+def _resultado(retcode, request, deal=0, order=0, volume=0.0, price=0.0, comment=""):
+    s = _sim.simbolos.get(request.get("symbol", ""))
+    bid, ask = (s.bid(_sim.ahora), s.ask(_sim.ahora)) if s else (0.0, 0.0)
+    return OrderSendResult(retcode, deal, order, volume, price, bid, ask, comment, 0, request)
+
+def _stops_validos(s, tipo, precio, sl, tp):
+    minimo = s.stops_level * s.point
+    if tipo == ORDER_TYPE_BUY:
+        return (not sl or sl <= precio - minimo) and (not tp or tp >= precio + minimo)
+    return (not sl or sl >= precio + minimo) and (not tp or tp <= precio - minimo)
+
+@_api
+def order_send(request):
+    accion = request.get("action")
+    if accion == TRADE_ACTION_SLTP:
+        p = _sim.posiciones.get(request.get("position"))
+        if p is None: return _resultado(TRADE_RETCODE_POSITION_CLOSED, request)
+        s = _sim.simbolos[p.symbol]
+        sl, tp = round(request.get("sl", 0.0), s.digits), round(request.get("tp", 0.0), s.digits)
+        if sl == p.sl and tp == p.tp: return _resultado(TRADE_RETCODE_NO_CHANGES, request, comment="No changes")
+        if not _stops_validos(s, p.type, _sim.precio_cierre(s, p.type), sl, tp):
+            return _resultado(TRADE_RETCODE_INVALID_STOPS, request, comment="Invalid stops")
+        _sim.posiciones[p.ticket] = p._replace(sl=sl, tp=tp)
+        return _resultado(TRADE_RETCODE_DONE, request, comment="Request executed")
+
+    if accion != TRADE_ACTION_DEAL: return _resultado(TRADE_RETCODE_INVALID, request)
+    s = _sim.simbolos.get(request.get("symbol"))
+    if s is None: return _resultado(TRADE_RETCODE_INVALID, request)
+    tipo, volumen = request.get("type"), request.get("volume", 0.0)
+    if volumen < s.volume_min: return _resultado(TRADE_RETCODE_INVALID_VOLUME, request)
+    if _sim.prob_requote and _sim.rng.random() < _sim.prob_requote:
+        return _resultado(TRADE_RETCODE_REQUOTE, request, comment="Requote")
+    deslizamiento = int(_sim.rng.integers(0, _sim.slippage_pts + 1)) * s.point if _sim.slippage_pts else 0.0
+    precio = s.ask(_sim.ahora) + deslizamiento if tipo == ORDER_TYPE_BUY else s.bid(_sim.ahora) - deslizamiento
+    precio = round(precio, s.digits)
+
+    if request.get("position"):  # Cierre por orden opuesta
+        p = _sim.posiciones.get(request["position"])
+        if p is None: return _resultado(TRADE_RETCODE_POSITION_CLOSED, request)
+        d = _sim.cerrar(p, precio)
+        return _resultado(TRADE_RETCODE_DONE, request, d.ticket, d.order, p.volume, precio)
+
+    sl, tp = round(request.get("sl", 0.0), s.digits), round(request.get("tp", 0.0), s.digits)
+    if not _stops_validos(s, tipo, precio, sl, tp): return _resultado(TRADE_RETCODE_INVALID_STOPS, request)
+    ticket = _sim._nuevo_ticket()
+    t = int(_sim.ahora)
+    _sim.posiciones[ticket] = TradePosition(ticket, t, t * 1000, tipo, request.get("magic", 0), ticket, volumen,
+                                            precio, sl, tp, precio, 0.0, 0.0, s.name, request.get("comment", ""))
+    d = TradeDeal(_sim._nuevo_ticket(), ticket, t, t * 1000, tipo, DEAL_ENTRY_IN, request.get("magic", 0), ticket,
+                  0, volumen, precio, 0.0, 0.0, 0.0, 0.0, s.name, "")
+    _sim.deals.append(d)
+    return _resultado(TRADE_RETCODE_DONE, request, d.ticket, ticket, volumen, precio, "Request executed")
@@ -0,0 +1,237 @@
+import os, json, time, random, hashlib, argparse, itertools, warnings
+import numpy as np
+import pandas as pd
+import joblib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.ensemble import RandomForestClassifier
+from indicadores import FEATURES, HORIZONTE_TARGET, calcular_indicadores, calcular_target
+from almacen_features import AlmacenFeatures
+
+# ==========================================
+# OPTIMIZADOR WALK-FORWARD DE PARÁMETROS
+# ==========================================
+# Uso: python optimizador.py EURUSD XAUUSD --modo random --muestras 200
+# Cada (símbolo, fold) entrena UN modelo y evalúa todos los parámetros sobre él.
+# Modelos y resultados se guardan en disco: una ejecución interrumpida se reanuda.
+
+warnings.filterwarnings("ignore", category=UserWarning)
+CACHE_DIR = os.path.join("memoria_ia", "optimizacion")
+VELAS_HISTORIAL = 20000
+VELAS_ENTRENAMIENTO = 2000   # Igual que tarea_entrenamiento en vivo
+VELAS_PRUEBA = 500
+BARRAS_POR_ANIO = 24 * 252   # H1
+GUARDAR_CADA = 25            # Parámetros evaluados entre escrituras del caché
+
+# Rejilla de búsqueda (incluye los valores de ambas versiones del bot: BE 1.0 y 1.5)
+ESPACIO_PARAMETROS = {
+    "PROBABILIDAD_IA_MINIMA": [0.60, 0.65, 0.70, 0.76, 0.80],
+    "BE_THRESHOLD": [0.75, 1.0, 1.5, 2.0],
+    "TS_DISTANCE": [1.0, 1.5, 2.0, 2.5],
+    "ATR_MULTI_SL": [1.0, 1.5, 2.0],
+    "ATR_MULTI_TP": [2.0, 3.0, 4.0, 5.0],
+}
+COLUMNAS_FOLD = list(dict.fromkeys(['time', 'open', 'high', 'low', 'close', 'atr'] + FEATURES + ['target']))
+
+def generar_parametros(modo="grid", muestras=100, semilla=42):
+    nombres = sorted(ESPACIO_PARAMETROS)
+    rejilla = [dict(zip(nombres, v)) for v in itertools.product(*(ESPACIO_PARAMETROS[n] for n in nombres))]
+    if modo == "random" and muestras < len(rejilla):
+        rejilla = random.Random(semilla).sample(rejilla, muestras)
+    return rejilla
+
+def clave_parametros(params):
+    return json.dumps(params, sort_keys=True)
+
+def generar_folds(n_filas, entrenamiento=VELAS_ENTRENAMIENTO, prueba=VELAS_PRUEBA):
+    """Ventanas deslizantes (ini_train, ini_test, fin_test) avanzando un bloque de prueba"""
+    folds, ini = [], 0
+    while ini + entrenamiento + prueba <= n_filas:
+        folds.append((ini, ini + entrenamiento, ini + entrenamiento + prueba))
+        ini += prueba
+    return folds
+
+def cargar_velas(symbol, n=VELAS_HISTORIAL, csv_dir=None):
+    """Velas H1 desde MT5 o desde <csv_dir>/<symbol>.csv (columnas de copy_rates)"""
+    if csv_dir:
+        ruta = os.path.join(csv_dir, f"{symbol}.csv")
+        return pd.read_csv(ruta) if os.path.exists(ruta) else None
+    import MetaTrader5 as mt5
+    if not mt5.initialize(): return None
+    rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_H1, 0, n)
+    return pd.DataFrame(rates) if rates is not None else None
+
+# ==========================================
+# SIMULACIÓN (replica abrir_orden + gestionar_proteccion_activa)
+# ==========================================
+
+def simular(o, h, l, c, atr, ema_l, prob, p):
+    """Devuelve los retornos (fracción del precio de entrada) de cada trade cerrado"""
+    p_min, be, ts = p["PROBABILIDAD_IA_MINIMA"], p["BE_THRESHOLD"], p["TS_DISTANCE"]
+    retornos, lado, entrada, sl, tp = [], 0, 0.0, 0.0, 0.0
+    for i in range(len(c) - 1):
+        if lado != 0:
+            # SL antes que TP si ambos caben en la misma vela (supuesto conservador)
+            if (lado == 1 and l[i] <= sl) or (lado == -1 and h[i] >= sl): salida = sl
+            elif (lado == 1 and h[i] >= tp) or (lado == -1 and l[i] <= tp): salida = tp
+            else: salida = None
+            if salida is not None:
+                retornos.append(lado * (salida - entrada) / entrada)
+                lado = 0
+            else:
+                a = atr[i]
+                if lado == 1:
+                    if (c[i] - entrada) > a * be and sl < entrada: sl = entrada + a * 0.1
+                    sl = max(sl, c[i] - a * ts)
+                else:
+                    if (entrada - c[i]) > a * be and sl > entrada: sl = entrada - a * 0.1
+                    sl = min(sl, c[i] + a * ts)
+        if lado == 0:
+            if prob[i] > p_min and c[i] > ema_l[i]: lado = 1
+            elif prob[i] < (1 - p_min) and c[i] < ema_l[i]: lado = -1
+            else: continue
+            entrada = o[i + 1]
+            sl = entrada - lado * atr[i] * p["ATR_MULTI_SL"]
+            tp = entrada + lado * atr[i] * p["ATR_MULTI_TP"]
+    if lado != 0: retornos.append(lado * (c[-1] - entrada) / entrada)
+    return np.asarray(retornos)
+
+def calcular_metricas(retornos, n_barras):
+    n = len(retornos)
+    if n == 0:
+        return {"trades": 0, "win_rate": 0.0, "retorno": 0.0, "sharpe": 0.0, "sortino": 0.0,
+                "max_drawdown": 0.0, "profit_factor": 0.0, "calmar": 0.0}
+    curva = np.cumprod(1 + retornos)
+    drawdown = 1 - curva / np.maximum.accumulate(np.concatenate(([1.0], curva)))[1:]
+    max_dd = float(drawdown.max())
+    trades_anio = n * BARRAS_POR_ANIO / max(n_barras, 1)
+    std, negativos = retornos.std(ddof=1) if n > 1 else 0.0, retornos[retornos < 0]
+    std_neg = np.sqrt((negativos ** 2).mean()) if len(negativos) else 0.0
+    ganancia, perdida = retornos[retornos > 0].sum(), -negativos.sum()
+    retorno_total = float(curva[-1] - 1)
+    return {
+        "trades": n,
+        "win_rate": round(float((retornos > 0).mean()), 4),
+        "retorno": round(retorno_total, 6),
+        "sharpe": round(float(retornos.mean() / std * np.sqrt(trades_anio)), 4) if std > 0 else 0.0,
+        "sortino": round(float(retornos.mean() / std_neg * np.sqrt(trades_anio)), 4) if std_neg > 0 else 0.0,
+        "max_drawdown": round(max_dd, 6),
+        "profit_factor": round(float(ganancia / perdida), 4) if perdida > 0 else float(ganancia > 0) * 99.0,
+        "calmar": round(retorno_total / max_dd, 4) if max_dd > 0 else 0.0,
+    }
+
+# ==========================================
+# TRABAJO POR FOLD (se ejecuta en el pool de procesos)
+# ==========================================
+
+def _escribir_json(ruta, datos):
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "w") as f: json.dump(datos, f)
+    os.replace(tmp, ruta)  # Atómico: un corte nunca deja el caché a medias
+
+def clave_fold(symbol, df_fold, fin_train):
+    h = hashlib.sha1(f"{symbol}|{fin_train}|{FEATURES}|{HORIZONTE_TARGET}".encode())
+    h.update(np.ascontiguousarray(df_fold[['time', 'close']].to_numpy()).tobytes())
+    return f"{symbol}_{h.hexdigest()[:16]}"
+
+def evaluar_fold(symbol, df_fold, fin_train, lista_parametros, cache_dir=CACHE_DIR):
+    clave = clave_fold(symbol, df_fold, fin_train)
+    ruta_modelo = os.path.join(cache_dir, "modelos", f"{clave}.joblib")
+    ruta_res = os.path.join(cache_dir, "resultados", f"{clave}.json")
+    resultados = {}
+    if os.path.exists(ruta_res):
+        with open(ruta_res) as f: resultados = json.load(f)
+    pendientes = [p for p in lista_parametros if clave_parametros(p) not in resultados]
+    if not pendientes: return symbol, clave, resultados
+
+    # Un único modelo por fold, reutilizado por todos los parámetros
+    if os.path.exists(ruta_modelo):
+        modelo = joblib.load(ruta_modelo)
+    else:
+        train = df_fold.iloc[:fin_train - HORIZONTE_TARGET]  # Purga: el target mira 3 velas al futuro
+        modelo = RandomForestClassifier(n_estimators=100, max_depth=10, n_jobs=1).fit(train[FEATURES], train['target'])
+        joblib.dump(modelo, ruta_modelo)
+
+    test = df_fold.iloc[fin_train:]
+    prob = modelo.predict_proba(test[FEATURES])[:, 1]
+    o, h, l, c, atr, ema_l = (test[k].to_numpy(dtype=float) for k in ['open', 'high', 'low', 'close', 'atr', 'ema_l'])
+    for n, p in enumerate(pendientes, 1):
+        resultados[clave_parametros(p)] = calcular_metricas(simular(o, h, l, c, atr, ema_l, prob, p), len(test))
+        if n % GUARDAR_CADA == 0: _escribir_json(ruta_res, resultados)
+    _escribir_json(ruta_res, resultados)
+    return symbol, clave, resultados
+
+# ==========================================
+# ORQUESTACIÓN
+# ==========================================
+
+def optimizar(simbolos, lista_parametros, csv_dir=None, workers=None, cache_dir=CACHE_DIR, almacen=None):
+    """`almacen`: AlmacenFeatures del bot; si se da, velas e indicadores se leen de ahí (solo lectura)"""
+    for sub in ("modelos", "resultados"): os.makedirs(os.path.join(cache_dir, sub), exist_ok=True)
+    tareas = []
+    for symbol in simbolos:
+        if almacen: df = almacen.leer_df(symbol, VELAS_HISTORIAL)
+        else: df = cargar_velas(symbol, csv_dir=csv_dir)
+        if df is None or len(df) < VELAS_ENTRENAMIENTO + VELAS_PRUEBA:
+            print(f"⚠️ {symbol}: historial insuficiente"); continue
+        if not almacen: df = calcular_indicadores(df)
+        df['target'] = calcular_target(df)
+        df = df.dropna().reset_index(drop=True)
+        for n, (ini, fin_train, fin_test) in enumerate(generar_folds(len(df))):
+            df_fold = df.iloc[ini:fin_test][COLUMNAS_FOLD].reset_index(drop=True)
+            tareas.append((symbol, n, df_fold, fin_train - ini))
+
+    filas = []
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futuros = {ex.submit(evaluar_fold, s, d, ft, lista_parametros, cache_dir): (s, n, d, ft) for s, n, d, ft in tareas}
+        for fut in as_completed(futuros):
+            symbol, n, df_fold, fin_train = futuros[fut]
+            try: _, clave, resultados = fut.result()
+            except Exception as e: print(f"❌ {symbol} fold {n}: {e}"); continue
+            desde = datetime.fromtimestamp(int(df_fold['time'].iloc[fin_train])).strftime("%Y-%m-%d")
+            hasta = datetime.fromtimestamp(int(df_fold['time'].iloc[-1])).strftime("%Y-%m-%d")
+            for p in lista_parametros:
+                m = resultados[clave_parametros(p)]
+                filas.append({"symbol": symbol, "fold": n, "desde": desde, "hasta": hasta, **p, **m})
+            mejor = max(lista_parametros, key=lambda p: resultados[clave_parametros(p)]["sharpe"])
+            mm = resultados[clave_parametros(mejor)]
+            print(f"✅ {symbol:<10} fold {n:>2} [{desde} → {hasta}] mejor Sharpe {mm['sharpe']:>7.2f} | "
+                  f"DD {mm['max_drawdown']:.2%} | PF {mm['profit_factor']:.2f} | trades {mm['trades']}")
+    return pd.DataFrame(filas)
+
+def resumir(df, min_trades=5):
+    """Ranking de parámetros por Sharpe medio fuera de muestra en todos los folds"""
+    if df.empty: return df
+    claves = sorted(ESPACIO_PARAMETROS)
+    res = df.groupby(claves).agg(
+        sharpe_medio=("sharpe", "mean"), sharpe_std=("sharpe", "std"), sortino_medio=("sortino", "mean"),
+        max_dd_peor=("max_drawdown", "max"), folds_positivos=("retorno", lambda r: float((r > 0).mean())),
+        trades=("trades", "sum"), folds=("fold", "count"),
+    ).reset_index()
+    res = res[res["trades"] >= min_trades]
+    return res.sort_values("sharpe_medio", ascending=False)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Optimizador walk-forward de parámetros del bot")
+    ap.add_argument("simbolos", nargs="+")
+    ap.add_argument("--modo", choices=["grid", "random"], default="grid")
+    ap.add_argument("--muestras", type=int, default=100)
+    ap.add_argument("--semilla", type=int, default=42)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--csv-dir", default=None, help="Leer velas de CSV en vez de MT5")
+    ap.add_argument("--almacen", action="store_true", help="Leer velas y features del almacén del bot (memoria_ia/features)")
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    params = generar_parametros(args.modo, args.muestras, args.semilla)
+    print(f"🔎 {len(params)} combinaciones x {len(args.simbolos)} símbolos (caché: {CACHE_DIR})")
+    t0 = time.time()
+    almacen = AlmacenFeatures(16385) if args.almacen else None  # 16385 = TIMEFRAME_H1
+    df = optimizar(args.simbolos, params, csv_dir=args.csv_dir, workers=args.workers, almacen=almacen)
+    if df.empty: print("❌ Sin resultados"); quit()
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    df.to_csv(os.path.join(CACHE_DIR, f"folds_{stamp}.csv"), index=False)
+    ranking = resumir(df)
+    ranking.to_csv(os.path.join(CACHE_DIR, f"ranking_{stamp}.csv"), index=False)
+    print(f"\n--- TOP {args.top} ({time.time() - t0:.1f}s) ---")
+    print(ranking.head(args.top).to_string(index=False))
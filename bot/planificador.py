@@ -0,0 +1,125 @@
+import time, threading
+import MetaTrader5 as mt5
+from concurrent.futures import ThreadPoolExecutor
+from metricas import METRICAS
+from estado_mercado import MERCADO
+
+# ==========================================
+# PLANIFICADOR POR EVENTOS
+# ==========================================
+# Sustituye el "recorrer todo + sleep(15)":
+#  - Sondea symbol_info_tick (barato) y dispara la evaluación de un símbolo al abrir vela nueva
+#    (inmediato) o al llegar ticks nuevos (como mucho cada `intervalo_min_evaluacion`).
+#  - Los símbolos se evalúan en paralelo con un pool acotado para no saturar el terminal.
+#  - Protección y mantenimiento (BD, panel) corren en sus propios hilos con cadencia fija.
+#  - Cada evento tiene un plazo; si se incumple se cuenta en METRICAS y se avisa por callback.
+
+class Planificador:
+    def __init__(self, activos, evaluar, proteger, mantenimiento, periodo_vela,
+                 max_concurrencia=4, intervalo_sondeo=0.5, intervalo_min_evaluacion=15.0,
+                 intervalo_proteccion=2.0, intervalo_mantenimiento=15.0,
+                 plazo_nueva_vela=2.0, plazo_evaluacion=5.0, al_incumplir=None):
+        self.evaluar, self.proteger, self.mantenimiento = evaluar, proteger, mantenimiento
+        self.periodo_vela, self.intervalo_sondeo = periodo_vela, intervalo_sondeo
+        self.intervalo_min_evaluacion = intervalo_min_evaluacion
+        self.intervalo_proteccion, self.intervalo_mantenimiento = intervalo_proteccion, intervalo_mantenimiento
+        self.plazos = {"vela": plazo_nueva_vela, "tick": plazo_evaluacion}
+        self.al_incumplir = al_incumplir
+        self._activos = list(activos)
+        self._ultimo_tick, self._ultima_vela, self._ultima_eval = {}, {}, {}
+        self._en_curso, self._pendientes = set(), {}
+        self._lock, self._parar = threading.Lock(), threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="evaluacion")
+
+    def actualizar_activos(self, activos):
+        with self._lock: self._activos = list(activos)
+
+    def detener(self):
+        self._parar.set()
+
+    def esperar_inactivo(self, sondeo=0.001):
+        """Bloquea hasta que no quede ninguna evaluación en curso ni pendiente (bench_bucle.py)"""
+        while True:
+            with self._lock:
+                if not self._en_curso: return
+            time.sleep(sondeo)
+
+    def _incumplido(self, nombre, symbol, demora):
+        METRICAS.incrementar("plazos_incumplidos", symbol=symbol or nombre)
+        if self.al_incumplir: self.al_incumplir(nombre, symbol, demora)
+
+    # --- Evaluación de símbolos ---
+
+    def _lanzar(self, s, tipo, t_evento):
+        with self._lock:
+            if s in self._en_curso:
+                # Se reevalúa al terminar; una vela nueva tiene prioridad sobre un tick
+                previo = self._pendientes.get(s)
+                if previo is None or tipo == "vela": self._pendientes[s] = (tipo, previo[1] if previo else t_evento)
+                return
+            self._en_curso.add(s)
+        self._pool.submit(self._tarea, s, tipo, t_evento)
+
+    def _tarea(self, s, tipo, t_evento):
+        try:
+            self.evaluar(s)
+        except Exception as e:
+            METRICAS.incrementar("errores_evaluacion", symbol=s)
+            print(f"Error evaluando {s}: {e}")
+        finally:
+            ahora = time.monotonic()
+            demora = ahora - t_evento
+            METRICAS.observar(f"latencia_evento_{tipo}", demora, s)
+            if demora > self.plazos[tipo]: self._incumplido(tipo, s, demora)
+            with self._lock:
+                self._ultima_eval[s] = ahora
+                siguiente = self._pendientes.pop(s, None)
+                if not siguiente: self._en_curso.discard(s)  # Con reevaluación pendiente sigue en curso
+            if siguiente: self._pool.submit(self._tarea, s, *siguiente)
+
+    def detectar_eventos(self):
+        """Un sondeo: devuelve [(symbol, tipo)] y los lanza"""
+        with self._lock: activos = list(self._activos)
+        ahora, eventos = time.monotonic(), []
+        for s in activos:
+            tick = mt5.symbol_info_tick(s)
+            if tick is None: continue
+            MERCADO.publicar_tick(s, tick.bid, tick.ask, tick.time_msc)
+            apertura = tick.time - tick.time % self.periodo_vela
+            if apertura > self._ultima_vela.get(s, 0):
+                self._ultima_vela[s] = apertura
+                eventos.append((s, "vela"))
+            elif tick.time_msc != self._ultimo_tick.get(s) and \
+                    ahora - self._ultima_eval.get(s, 0) >= self.intervalo_min_evaluacion:
+                eventos.append((s, "tick"))
+            self._ultimo_tick[s] = tick.time_msc
+        for s, tipo in eventos: self._lanzar(s, tipo, ahora)
+        return eventos
+
+    # --- Tareas periódicas ---
+
+    def _periodico(self, nombre, fn, intervalo):
+        siguiente = time.monotonic()
+        while not self._parar.is_set():
+            t0 = time.monotonic()
+            try:
+                with METRICAS.span(nombre): fn()
+            except Exception as e: print(f"Error {nombre}: {e}")
+            duracion = time.monotonic() - t0
+            if duracion > intervalo: self._incumplido(nombre, "", duracion)
+            siguiente += intervalo
+            if siguiente < time.monotonic(): siguiente = time.monotonic()  # Atrasado: no acumular ráfagas
+            self._parar.wait(max(siguiente - time.monotonic(), 0))
+
+    def ejecutar(self):
+        """Bloquea hasta detener(); la detección de eventos corre en el hilo que llama"""
+        hilos = [threading.Thread(target=self._periodico, args=a, daemon=True, name=a[0]) for a in
+                 [("proteccion", self.proteger, self.intervalo_proteccion),
+                  ("mantenimiento", self.mantenimiento, self.intervalo_mantenimiento)]]
+        for h in hilos: h.start()
+        while not self._parar.is_set():
+            try:
+                with METRICAS.span("sondeo"): self.detectar_eventos()
+            except Exception as e: print(f"Error sondeo: {e}")
+            self._parar.wait(self.intervalo_sondeo)
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,20 @@
+import numpy as np
+
+# ==========================================
+# CÁLCULO VECTORIZADO DE BREAK-EVEN Y TRAILING STOP
+# ==========================================
+
+def calcular_stops(tipo, price_open, precio, sl, atr, be_threshold, ts_distance, colchon_be=0.1):
+    """Evalúa todas las posiciones de una vez (arrays numpy alineados, tipo 0=BUY 1=SELL).
+    Devuelve (nuevo_sl, modificar, break_even) con la misma lógica que la versión por posición."""
+    compra = tipo == 0
+    ganancia = np.where(compra, precio - price_open, price_open - precio)
+    sl_desfavorable = np.where(compra, sl < price_open, (sl > price_open) | (sl == 0))
+    be = (ganancia > atr * be_threshold) & sl_desfavorable
+    nuevo_sl = np.where(be, np.where(compra, price_open + atr * colchon_be, price_open - atr * colchon_be), sl)
+
+    objetivo = np.where(compra, precio - atr * ts_distance, precio + atr * ts_distance)
+    mejora = np.where(compra, objetivo > nuevo_sl, (nuevo_sl == 0) | (objetivo < nuevo_sl))
+    nuevo_sl = np.where(mejora, objetivo, nuevo_sl)
+    valido = ~np.isnan(atr)
+    return nuevo_sl, (be | mejora) & valido, be & valido
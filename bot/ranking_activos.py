@@ -0,0 +1,93 @@
+import time, threading
+import numpy as np
+import MetaTrader5 as mt5
+from concurrent.futures import ThreadPoolExecutor
+from metricas import METRICAS
+
+# ==========================================
+# RANKING DEL UNIVERSO DE SÍMBOLOS
+# ==========================================
+# Puntúa todos los candidatos de symbols_get con un histórico corto descargado en paralelo:
+#   volatilidad relativa (rango medio / precio)   -> más es mejor
+#   liquidez (mediana de tick_volume)             -> más es mejor
+#   coste (spread / rango medio)                  -> menos es mejor; por encima de coste_max se descarta
+# Se reescanea en segundo plano y el nuevo universo se entrega por callback sin parar el bucle.
+
+PESOS = {"volatilidad": 0.35, "liquidez": 0.35, "coste": 0.30}
+
+def _rango_pct(x):
+    """Rango percentil 0..1 (0 = menor valor)"""
+    return x.argsort().argsort() / max(len(x) - 1, 1)
+
+class RankingActivos:
+    def __init__(self, n_activos, timeframe, velas=120, workers=8, intervalo=4 * 3600, coste_max=0.25,
+                 solo_visibles=True, espera_descartado=24 * 3600, al_cambiar=None, filtro=None):
+        self.n_activos, self.timeframe, self.velas, self.workers = n_activos, timeframe, velas, workers
+        self.intervalo, self.coste_max, self.solo_visibles = intervalo, coste_max, solo_visibles
+        self.espera_descartado, self.al_cambiar = espera_descartado, al_cambiar
+        self.filtro = filtro  # symbol -> bool (p. ej. Shard.propio)
+        self.universo, self.puntuaciones = (), []
+        self._descartados = {}  # symbol -> monotonic hasta el que no se vuelve a descargar
+        self._parar = threading.Event()
+
+    def candidatos(self):
+        simbolos = mt5.symbols_get()
+        if simbolos is None: return []
+        ahora = time.monotonic()
+        # Solo FULL: en close-only / long-only / short-only casi toda apertura se rechaza y el hueco se pierde
+        return [s for s in simbolos if s.trade_mode == mt5.SYMBOL_TRADE_MODE_FULL
+                and (s.visible or not self.solo_visibles) and self._descartados.get(s.name, 0) < ahora
+                and (self.filtro is None or self.filtro(s.name))]
+
+    def _velas(self, symbol):
+        return mt5.copy_rates_from_pos(symbol, self.timeframe, 0, self.velas)
+
+    def puntuar(self, candidatos, historicos):
+        """Vectorizado: una matriz (símbolos x velas) por campo"""
+        ahora, validos = time.monotonic(), []
+        for s, r in zip(candidatos, historicos):
+            if r is None or len(r) < self.velas: self._descartados[s.name] = ahora + self.espera_descartado
+            else: validos.append((s, r))
+        if not validos: return []
+        H = np.vstack([r['high'] for _, r in validos]); L = np.vstack([r['low'] for _, r in validos])
+        C = np.vstack([r['close'] for _, r in validos]); V = np.vstack([r['tick_volume'] for _, r in validos])
+        spread = np.array([s.spread * s.point for s, _ in validos])
+
+        rango = (H - L).mean(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volatilidad = np.where(C[:, -1] > 0, rango / C[:, -1], 0.0)
+            coste = np.where(rango > 0, spread / rango, np.inf)
+        liquidez = np.median(V, axis=1).astype(float)
+        score = (PESOS["volatilidad"] * _rango_pct(volatilidad) + PESOS["liquidez"] * _rango_pct(liquidez)
+                 + PESOS["coste"] * (1 - _rango_pct(coste)))
+        score[~(coste <= self.coste_max)] = -np.inf
+
+        orden = np.argsort(-score)
+        return [{"symbol": validos[i][0].name, "score": round(float(score[i]), 4),
+                 "volatilidad": float(volatilidad[i]), "liquidez": float(liquidez[i]), "coste": float(coste[i])}
+                for i in orden if np.isfinite(score[i])]
+
+    def escanear(self):
+        """Un escaneo completo; devuelve el universo (tupla) y lo publica si cambió"""
+        with METRICAS.span("ranking"):
+            candidatos = self.candidatos()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ranking") as ex:
+                historicos = list(ex.map(self._velas, [s.name for s in candidatos]))
+            self.puntuaciones = self.puntuar(candidatos, historicos)
+        METRICAS.fijar("ranking_candidatos", len(candidatos))
+        nuevo = tuple(p["symbol"] for p in self.puntuaciones[:self.n_activos])
+        if nuevo and nuevo != self.universo:
+            self.universo = nuevo
+            if self.al_cambiar: self.al_cambiar(list(nuevo))
+        return self.universo
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            try: self.escanear()
+            except Exception as e: print(f"Error ranking: {e}")
+
+    def iniciar(self):
+        threading.Thread(target=self._bucle, daemon=True, name="ranking").start()
+
+    def detener(self):
+        self._parar.set()
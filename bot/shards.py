@@ -0,0 +1,42 @@
+import os, zlib
+
+# ==========================================
+# REPARTO DE SÍMBOLOS ENTRE PROCESOS (SHARDS)
+# ==========================================
+# Uso: BOT_SHARD=0/3 python tradingbot_ia.py   (y 1/3, 2/3 en otros procesos)
+# Cada símbolo pertenece a un único shard: crc32(symbol) % total (estable entre procesos y reinicios).
+# El shard 0 es el coordinador: es el único que escribe lo que es de la cuenta (trades, live_positions,
+# bot_status id=1). Cada shard publica su salud en bot_status con id = ID_ESTADO_BASE + índice.
+# El tope global de posiciones se reserva en MySQL (DatabaseManager.reservar_posicion).
+# Métricas Prometheus de cada shard en PUERTO_METRICAS + índice (9108, 9109, ...).
+
+ID_ESTADO_BASE = 100
+
+class Shard:
+    def __init__(self, indice=0, total=1):
+        if not 0 <= indice < total: raise ValueError(f"Shard inválido: {indice}/{total}")
+        self.indice, self.total = indice, total
+
+    @classmethod
+    def desde_entorno(cls, variable="BOT_SHARD"):
+        """'i/N' desde el entorno; sin variable = un solo proceso con todos los símbolos"""
+        indice, total = os.environ.get(variable, "0/1").split("/")
+        return cls(int(indice), int(total))
+
+    @property
+    def activo(self):
+        return self.total > 1
+
+    @property
+    def coordinador(self):
+        return self.indice == 0
+
+    @property
+    def id_estado(self):
+        return ID_ESTADO_BASE + self.indice
+
+    def propio(self, symbol):
+        return self.total == 1 or zlib.crc32(symbol.encode()) % self.total == self.indice
+
+    def __repr__(self):
+        return f"{self.indice}/{self.total}"
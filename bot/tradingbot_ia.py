@@ -2,11 +2,22 @@ import MetaTrader5 as mt5
 import pandas as pd
 import pandas_ta as ta
 import numpy as np
-import os, time, joblib, warnings, threading
+import os, time, math, joblib, warnings, threading
 from datetime import datetime, timedelta
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from sklearn.ensemble import RandomForestClassifier
 from database_manager import DatabaseManager
+from indicadores import FEATURES, calcular_target
+from metricas import METRICAS
+from planificador import Planificador
+from estado_mercado import MERCADO
+from proteccion import calcular_stops
+from modificaciones import GestorModificaciones
+from ejecucion import TablaSimbolos, Ejecutor
+from flujo_ticks import FlujoTicks
+from ranking_activos import RankingActivos
+from almacen_features import AlmacenFeatures
+from shards import Shard
 
 # --- CONFIGURACIÓN ELITE v6.1 ---
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -14,21 +25,63 @@ MODEL_DIR = "memoria_ia"
 if not os.path.exists(MODEL_DIR): os.makedirs(MODEL_DIR)
 
 MAX_ACTIVOS = 15
-MAX_POSICIONES_GLOBALES = 3
+RE_SCAN_HOURS = 4       # Reescaneo del universo de símbolos
+VELAS_RANKING = 120     # Histórico corto usado para puntuar candidatos
+MAX_POSICIONES_GLOBALES = 3  # Tope de toda la cuenta: en modo shard se reserva en MySQL
 MAGIC_NUMBER = 77193582
 TIMEFRAME = mt5.TIMEFRAME_H1
+PERIODO_VELA_S = 3600  # Duración de una vela de TIMEFRAME
 PROBABILIDAD_IA_MINIMA = 0.76
+VELAS_ENTRENAMIENTO = 2000
+HISTORIAL_ALMACEN = 5000  # Velas cerradas que se descargan al crear el almacén de un símbolo
 
 # PROTECCIÓN ACTIVA (VALORES OPTIMIZADOS)
 BE_THRESHOLD = 1.0  # Mover a 0 riesgo cuando ganancia = 1x ATR
 TS_DISTANCE = 1.5   # Perseguir precio a 1.5x ATR
 ATR_MULTI_SL = 1.5  # Stop Loss inicial
 ATR_MULTI_TP = 4.0  # Take Profit inicial
-FEATURES = ['rsi', 'ema_l', 'ema_r', 'volatilidad']
+REINTENTOS_RECOTIZACION = 2  # Reenvíos ante requote / cambio de precio
+
+# OBSERVABILIDAD
+PUERTO_METRICAS = 9108 # http://127.0.0.1:9108/metrics (Prometheus); cada shard usa PUERTO_METRICAS + índice
+
+# PLANIFICADOR (segundos)
+MAX_EVALUACIONES_CONCURRENTES = 4  # Símbolos evaluados a la vez contra el terminal
+INTERVALO_SONDEO = 0.5             # Sondeo de ticks para detectar eventos
+INTERVALO_MIN_EVALUACION = 15      # Reevaluación por ticks dentro de la misma vela
+INTERVALO_PROTECCION = 2           # BE / trailing
+INTERVALO_MANTENIMIENTO = 15       # BD, sincronización y panel
+INTERVALO_COMPACTACION = 300       # Serie de monitoreo: raw -> 1 min -> 1 h y retención
+PLAZO_NUEVA_VELA = 2               # Vela nueva -> señal evaluada antes de este plazo
+PLAZO_EVALUACION = 5
+INTERVALO_TICKS = 0.1              # Ingesta de ticks de símbolos con posición abierta
+CAPACIDAD_ANILLO_TICKS = 4096
+MERCADO.ttl_atr, MERCADO.ttl_precio = 4 * INTERVALO_MIN_EVALUACION, 4 * INTERVALO_SONDEO
+
+# SHARDS (BOT_SHARD=i/N; sin variable = un solo proceso)
+SHARD = Shard.desde_entorno()
+TTL_RESERVA = 60  # Segundos que vive una reserva de posición sin confirmar
+
+# MODIFICACIONES SL/TP (solo se envían mejoras significativas)
+PASO_MIN_PUNTOS = 5             # Mejora mínima del SL en puntos...
+PASO_MIN_ATR = 0.05             # ...o en fracción de ATR (se exige la mayor)
+INTERVALO_MIN_MODIFICACION = 10 # Segundos entre modificaciones de una misma posición
+
+def lote_base(symbol):
+    return 0.01 if any(x in symbol for x in ["BTC", "XAU", "ETH", "NAS"]) else 0.1
+
+SIMBOLOS = TablaSimbolos()  # Especificaciones cacheadas (llenado, volumen, dígitos, stops level)
+EJECUTOR = Ejecutor(SIMBOLOS, MAGIC_NUMBER, lote_base, REINTENTOS_RECOTIZACION)
+MODIFICACIONES = GestorModificaciones(PASO_MIN_PUNTOS, PASO_MIN_ATR, INTERVALO_MIN_MODIFICACION, simbolos=SIMBOLOS)
+ALMACEN = AlmacenFeatures(TIMEFRAME)  # Velas cerradas + features en disco (memoria_ia/features)
 
 db = DatabaseManager(host="192.168.3.5", user="bot_user", password="S0portefcbv", database="traderbot_db")
 LOG_BUFFER = []
 MODELOS_IA = {}
+POSICIONES = ()  # Última foto de posiciones (la refresca la protección)
+PANEL = {}       # symbol -> última evaluación para el panel
+ADMISION_LOCK = threading.Lock()  # Evalúa el tope global y abre orden de forma atómica
+ULTIMA_COMPACTACION = 0.0  # monotonic de la última compactación de la serie de monitoreo
 
 def agregar_log(msg):
     t = datetime.now().strftime("%H:%M:%S")
@@ -39,85 +92,184 @@ def agregar_log(msg):
 # MOTOR DE DEFENSA ACTIVA
 # ==========================================
 
-def gestionar_proteccion_activa(posiciones, magic_number):
-    for p in posiciones:
-        if p.magic != magic_number: continue
-        symbol = p.symbol
+def atr_proteccion(symbol):
+    """ATR compartido con la evaluación de señales; solo se piden velas si no hay dato fresco
+    (símbolo fuera de los vigilados o evaluación atrasada)"""
+    atr = MERCADO.atr(symbol)
+    if atr is not None: return atr
+    METRICAS.incrementar("atr_fallback", symbol=symbol)
+    with METRICAS.span("velas_proteccion", symbol):
         rates = mt5.copy_rates_from_pos(symbol, TIMEFRAME, 0, 20)
-        if rates is None: continue
-        df_atr = pd.DataFrame(rates)
-        atr = ta.atr(df_atr['high'], df_atr['low'], df_atr['close'], length=14).iloc[-1]
-        
-        nuevo_sl = p.sl
-        modificar = False
-        
-        if p.type == 0: # BUY
-            # 1. Break-Even
-            if (p.price_current - p.price_open) > (atr * BE_THRESHOLD) and p.sl < p.price_open:
-                nuevo_sl = p.price_open + (atr * 0.1)
-                modificar = True
-                agregar_log(f"🛡️ BE BUY: {symbol}")
-            # 2. Trailing Stop
-            target_ts = p.price_current - (atr * TS_DISTANCE)
-            if target_ts > nuevo_sl:
-                nuevo_sl = target_ts
-                modificar = True
-        else: # SELL
-            # 1. Break-Even
-            if (p.price_open - p.price_current) > (atr * BE_THRESHOLD) and (p.sl > p.price_open or p.sl == 0):
-                nuevo_sl = p.price_open - (atr * 0.1)
-                modificar = True
-                agregar_log(f"🛡️ BE SELL: {symbol}")
-            # 2. Trailing Stop
-            target_ts = p.price_current + (atr * TS_DISTANCE)
-            if nuevo_sl == 0 or target_ts < nuevo_sl:
-                nuevo_sl = target_ts
-                modificar = True
-
-        if modificar:
-            request = {"action": mt5.TRADE_ACTION_SLTP, "position": p.ticket, "sl": nuevo_sl, "tp": p.tp}
-            mt5.order_send(request)
+    if rates is None: return np.nan
+    df_atr = pd.DataFrame(rates)
+    atr = ta.atr(df_atr['high'], df_atr['low'], df_atr['close'], length=14).iloc[-1]
+    MERCADO.publicar_indicadores(symbol, atr, rates[-1]['close'], rates[-1]['time'])
+    return atr
+
+def aplicar_proteccion(pos, precio, atr_por_simbolo):
+    """BE + trailing vectorizado sobre `pos` con los precios dados; las órdenes pasan por MODIFICACIONES"""
+    nuevo_sl, modificar, be = calcular_stops(
+        np.array([p.type for p in pos]), np.array([p.price_open for p in pos]), np.array(precio),
+        np.array([MODIFICACIONES.sl_vigente(p) for p in pos]),
+        np.array([atr_por_simbolo[p.symbol] for p in pos], dtype=float), BE_THRESHOLD, TS_DISTANCE)
+
+    for i in np.flatnonzero(modificar):
+        p = pos[i]
+        aceptada = MODIFICACIONES.solicitar(p, float(nuevo_sl[i]), atr_por_simbolo[p.symbol], forzar=bool(be[i]), precio=precio[i])
+        if aceptada and be[i]: agregar_log(f"🛡️ BE {'BUY' if p.type == 0 else 'SELL'}: {p.symbol}")
+
+def gestionar_proteccion_activa(posiciones, magic_number):
+    pos = [p for p in posiciones if p.magic == magic_number and SHARD.propio(p.symbol)]
+    MODIFICACIONES.purgar({p.ticket for p in pos})
+    if not pos: return
+    atr_por_simbolo = {s: atr_proteccion(s) for s in {p.symbol for p in pos}}
+
+    # Precio de cierre más reciente: tick del planificador si está fresco, si no el de la posición
+    precio = []
+    for p in pos:
+        px = MERCADO.precios(p.symbol)
+        precio.append(p.price_current if px is None else (px[0] if p.type == 0 else px[1]))
+    aplicar_proteccion(pos, precio, atr_por_simbolo)
+
+def proteger_por_tick(symbol, anillo):
+    """Llamado por FLUJO_TICKS con cada lote de ticks nuevos: sin pedir velas, solo ATR en caché"""
+    _, bid, ask = anillo.ultimo()
+    MERCADO.publicar_tick(symbol, bid, ask, anillo.ultimo()[0])
+    pos = [p for p in POSICIONES if p.symbol == symbol and p.magic == MAGIC_NUMBER]
+    atr = MERCADO.atr(symbol)
+    if not pos or atr is None: return
+    aplicar_proteccion(pos, [bid if p.type == 0 else ask for p in pos], {symbol: atr})
+
+FLUJO_TICKS = FlujoTicks(proteger_por_tick, CAPACIDAD_ANILLO_TICKS, INTERVALO_TICKS)
 
 # ==========================================
 # LÓGICA DE TRADING E IA
 # ==========================================
 
 def tarea_entrenamiento(symbol):
+    """Corre en otro proceso: lee las features del ALMACEN (sincronizado antes por el proceso principal)"""
     try:
-        if not mt5.initialize(): return symbol, None
-        rates = mt5.copy_rates_from_pos(symbol, TIMEFRAME, 0, 2000)
-        if rates is None: return symbol, None
-        df = pd.DataFrame(rates)
-        df['rsi'] = ta.rsi(df['close'], length=14)
-        df['ema_l'], df['ema_r'] = ta.ema(df['close'], 200), ta.ema(df['close'], 50)
-        df['volatilidad'] = df['high'] - df['low']
-        df['target'] = (df['close'].shift(-3) > df['close']).astype(int)
+        df = ALMACEN.leer_df(symbol, VELAS_ENTRENAMIENTO)
+        if df is None: return symbol, None
+        df['target'] = calcular_target(df)
         df = df.dropna()
         X, y = df[FEATURES], df['target']
         modelo = RandomForestClassifier(n_estimators=100, max_depth=10).fit(X, y)
         return symbol, modelo
     except: return symbol, None
 
-def abrir_orden(tipo, symbol, atr):
-    lot = 0.01 if any(x in symbol for x in ["BTC", "XAU", "ETH", "NAS"]) else 0.1
-    tick = mt5.symbol_info_tick(symbol)
-    s_info = mt5.symbol_info(symbol)
-    precio = tick.ask if tipo == "COMPRA" else tick.bid
-    fill = mt5.ORDER_FILLING_FOK if s_info.filling_mode & 1 else mt5.ORDER_FILLING_IOC
-    request = {
-        "action": mt5.TRADE_ACTION_DEAL, "symbol": symbol, "volume": lot,
-        "type": mt5.ORDER_TYPE_BUY if tipo == "COMPRA" else mt5.ORDER_TYPE_SELL,
-        "price": precio, "magic": MAGIC_NUMBER,
-        "sl": precio - (atr*ATR_MULTI_SL) if tipo=="COMPRA" else precio + (atr*ATR_MULTI_SL),
-        "tp": precio + (atr*ATR_MULTI_TP) if tipo=="COMPRA" else precio - (atr*ATR_MULTI_TP),
-        "type_filling": fill, "type_time": mt5.ORDER_TIME_GTC
-    }
-    mt5.order_send(request)
-    agregar_log(f"🚀 {tipo} {symbol}")
+def abrir_orden(tipo, symbol, atr, t_senal=None, db_pool=None):
+    res, ejec = EJECUTOR.ejecutar(tipo == "COMPRA", symbol, atr*ATR_MULTI_SL, atr*ATR_MULTI_TP, t_senal)
+    if ejec is None:
+        agregar_log(f"❌ {tipo} {symbol}: sin respuesta {mt5.last_error()}"); return False
+    if db_pool: enviar_db(db_pool, "db_ejecuciones", db.registrar_ejecucion, ejec._asdict())
+    if ejec.retcode != mt5.TRADE_RETCODE_DONE:
+        agregar_log(f"❌ {tipo} {symbol}: {ejec.retcode} {ejec.comment}"); return False
+    agregar_log(f"🚀 {tipo} {symbol} ({ejec.signal_to_fill_ms:.0f} ms, desliz {ejec.slippage_points} pts)")
+    return ejec.ticket
+
+def admitir_y_abrir(tipo, symbol, atr, t_senal=None, db_pool=None):
+    """En modo shard el hueco bajo MAX_POSICIONES_GLOBALES se reserva en MySQL antes de enviar la orden,
+    así dos procesos no pueden superar el tope aunque lo comprueben a la vez"""
+    if not SHARD.activo: return abrir_orden(tipo, symbol, atr, t_senal, db_pool)
+    with METRICAS.span("reserva", symbol):
+        concedida = db.reservar_posicion(symbol, SHARD.indice, MAX_POSICIONES_GLOBALES, TTL_RESERVA)
+    if not concedida:
+        METRICAS.incrementar("reservas_denegadas", symbol=symbol); return False
+    ticket = abrir_orden(tipo, symbol, atr, t_senal, db_pool)
+    if ticket: db.confirmar_reserva(symbol, ticket)
+    else: db.liberar_reserva(symbol)
+    return ticket
+
+def enviar_db(db_pool, etapa, fn, *args):
+    """Encola una escritura en BD midiendo su duración y la profundidad de la cola"""
+    METRICAS.incrementar("db_encoladas")
+    def tarea():
+        try: return METRICAS.cronometrar(etapa, fn, *args)
+        finally: METRICAS.incrementar("db_completadas")
+    return db_pool.submit(tarea)
+
+def evaluar_simbolo(s, pos, db_pool):
+    # Solo la última vela cerrada y la que está en formación: el resto sale del ALMACEN
+    with METRICAS.span("velas", s):
+        rates = mt5.copy_rates_from_pos(s, TIMEFRAME, 0, 2)
+    if rates is None or len(rates) < 2 or s not in MODELOS_IA: return None
+    if rates[0]['time'] != ALMACEN.ultimo_time(s):
+        with METRICAS.span("almacen", s): ALMACEN.sincronizar(s, HISTORIAL_ALMACEN)
+    with METRICAS.span("indicadores", s):
+        last = ALMACEN.vela_actual(s, rates[-1])  # O(1): recursión desde el estado guardado de la última cerrada
+        if last is None: return None
+    MERCADO.publicar_indicadores(s, last['atr'], last['close'], rates[-1]['time'])
+    
+    with METRICAS.span("prediccion", s):
+        prob = MODELOS_IA[s].predict_proba(pd.DataFrame([last[FEATURES].values], columns=FEATURES))[0][1]
+    t_senal = time.perf_counter()
+    
+    # Lógica Verbos
+    signal, motivo = "ESPERAR", "IA Neutral"
+    if prob > PROBABILIDAD_IA_MINIMA:
+        if last['close'] > last['ema_l']: signal = "COMPRA"
+        else: motivo = "EMA Filtro"
+    elif prob < (1 - PROBABILIDAD_IA_MINIMA):
+        if last['close'] < last['ema_l']: signal = "VENTA"
+        else: motivo = "EMA Filtro"
+
+    is_open = any(p.symbol == s for p in pos) if pos else False
+    if signal != "ESPERAR" and not is_open:
+        # Con símbolos en paralelo, la foto `pos` puede estar vieja: se revalida bajo el lock
+        with ADMISION_LOCK:
+            actuales = mt5.positions_get(magic=MAGIC_NUMBER) or ()
+            is_open = any(p.symbol == s for p in actuales)
+            if not is_open and len(actuales) < MAX_POSICIONES_GLOBALES:
+                admitir_y_abrir(signal, s, last['atr'], t_senal, db_pool)
+
+    db.registrar_muestra(s, float(last['close']), float(last['rsi']), float(prob), "ABIERTA" if is_open else signal)
+    d = {"s":s, "ia":prob, "st": "ABIERTA" if is_open else signal, "m": motivo if signal=="ESPERAR" else "OK"}
+    PANEL[s] = d
+    return d
+
+def ciclo_proteccion():
+    global POSICIONES
+    with METRICAS.span("posiciones"):
+        pos = mt5.positions_get(magic=MAGIC_NUMBER)
+    POSICIONES = pos or ()  # Toda la cuenta; la protección solo toca las del shard
+    FLUJO_TICKS.vigilar({p.symbol for p in POSICIONES if SHARD.propio(p.symbol)})
+    METRICAS.fijar("posiciones_abiertas", len(POSICIONES))
+    if pos: gestionar_proteccion_activa(pos, MAGIC_NUMBER)
+    return pos
+
+def ciclo_mantenimiento(db_pool, activos=()):
+    global ULTIMA_COMPACTACION
+    with METRICAS.span("cuenta"):
+        acc = mt5.account_info()
+    resumen = METRICAS.resumen()
+    enviar_db(db_pool, "db_monitoreo", db.volcar_monitoreo)  # Todas las muestras del intervalo en un lote
+    if SHARD.coordinador:  # Lo que es de la cuenta lo escribe un solo proceso
+        if time.monotonic() - ULTIMA_COMPACTACION >= INTERVALO_COMPACTACION:
+            ULTIMA_COMPACTACION = time.monotonic()
+            enviar_db(db_pool, "db_compactacion", db.compactar_monitoreo)
+        with METRICAS.span("db_posiciones_vivas"):
+            db.actualizar_posiciones_vivas(POSICIONES, MAGIC_NUMBER)
+        enviar_db(db_pool, "db_sincronizar_trades", db.sincronizar_trades, MAGIC_NUMBER)
+        enviar_db(db_pool, "db_estado_bot", db.actualizar_estado_bot, True, acc.balance, acc.equity, resumen)
+    if SHARD.activo:
+        propias = {p.symbol: p.ticket for p in POSICIONES if SHARD.propio(p.symbol)}
+        enviar_db(db_pool, "db_reservas", db.reconciliar_reservas, SHARD.indice, propias)
+        salud = {**resumen, "shard": {"indice": SHARD.indice, "total": SHARD.total, "simbolos": list(activos),
+                                      "posiciones": len(propias)}}
+        enviar_db(db_pool, "db_estado_shard", db.actualizar_estado_bot, True, acc.balance, acc.equity, salud, SHARD.id_estado)
+    return acc
+
+def mostrar_panel(acc, dash):
+    os.system('cls')
+    r = METRICAS.resumen()
+    print(f"--- SENTINEL v6.1{f' [shard {SHARD}]' if SHARD.activo else ''} | {datetime.now().strftime('%H:%M:%S')} | Balance: {acc.balance} | Eval p95: {r['latencia_evaluacion_p95_ms']:.0f} ms | Plazos incumplidos: {r['contadores'].get('plazos_incumplidos', 0):.0f} ---")
+    for d in dash: print(f"{d['s']:<10} | IA: {d['ia']:.2%} | {d['st']:<10} | {d['m']}")
+    for l in reversed(LOG_BUFFER): print(f"> {l}")
 
 if __name__ == "__main__":
-    # 1. Inicialización con reintentos
-    if not mt5.initialize():
+    # 1. Inicialización con reintentos (MT5_PATH: terminal propio de este shard, si se usa uno por proceso)
+    if not (mt5.initialize(path=os.environ["MT5_PATH"]) if os.environ.get("MT5_PATH") else mt5.initialize()):
         print("Fallo al iniciar MT5"); quit()
     
     # 2. Verificación de cuenta
@@ -127,73 +279,70 @@ if __name__ == "__main__":
     else:
         print(f"✅ Conectado a Libertex - Cuenta: {account_info.login}")
 
-    print("Auditoría de datos..."); db.sincronizar_trades(MAGIC_NUMBER)
+    if SHARD.coordinador:
+        print("Auditoría de datos..."); db.sincronizar_trades(MAGIC_NUMBER)
     
-    # 3. Obtención de activos con manejo de errores (Libertex Fix)
-    print("Obteniendo lista de activos...")
-    todos_los_simbolos = mt5.symbols_get()
-    
-    if todos_los_simbolos is None:
+    # 3. Selección de activos por ranking (spread, volatilidad, liquidez); cada shard puntúa solo los suyos
+    print(f"Puntuando activos{f' del shard {SHARD}' if SHARD.activo else ''}...")
+    ranking = RankingActivos(math.ceil(MAX_ACTIVOS / SHARD.total), TIMEFRAME, VELAS_RANKING,
+                             intervalo=RE_SCAN_HOURS * 3600, filtro=SHARD.propio)
+    activos = list(ranking.escanear())
+    if not activos:
         print("❌ Error: No se recibieron símbolos. Reintenta en 5 segundos...")
         time.sleep(5)
-        todos_los_simbolos = mt5.symbols_get()
-
-    if todos_los_simbolos is not None:
-        # Libertex usa nombres como EURUSD o EURUSD_ (con guión). 
-        # Buscamos coincidencias parciales.
-        keywords = ["USD", "BTC", "XAU", "NAS", "GOLD", "ETH"]
-        activos = [s.name for s in todos_los_simbolos if s.visible and any(k in s.name.upper() for k in keywords)]
-        activos = activos[:MAX_ACTIVOS]
-        print(f"👍 Activos encontrados en Libertex: {activos}")
+        activos = list(ranking.escanear())
+
+    if activos:
+        print(f"👍 Activos seleccionados: {activos}")
     else:
         print("❌ No se pudieron cargar activos. Asegúrate de dar clic derecho en Market Watch -> 'Show All'")
         quit()
 
-    # 4. Entrenamiento (Igual que antes)
-    with ProcessPoolExecutor() as ex:
-        for sym, mod in ex.map(tarea_entrenamiento, activos):
-            if mod: MODELOS_IA[sym] = mod
+    SIMBOLOS.precargar(activos)
 
+    # 4. Entrenamiento: el almacén se pone al día aquí y los procesos solo leen
+    for s in activos: ALMACEN.sincronizar(s, HISTORIAL_ALMACEN)
+    pool_entrenamiento = ProcessPoolExecutor()
+    for sym, mod in pool_entrenamiento.map(tarea_entrenamiento, activos):
+        if mod: MODELOS_IA[sym] = mod
+
+    try: METRICAS.iniciar_servidor(PUERTO_METRICAS + SHARD.indice)  # Varios shards en la misma máquina
+    except OSError as e: print(f"⚠️ Sin servidor de métricas en {PUERTO_METRICAS + SHARD.indice}: {e}")
+    FLUJO_TICKS.iniciar()
     db_pool = ThreadPoolExecutor(max_workers=2)
-    while True:
-        try:
-            acc = mt5.account_info()
-            pos = mt5.positions_get(magic=MAGIC_NUMBER)
-            if pos: gestionar_proteccion_activa(pos, MAGIC_NUMBER)
-            db.actualizar_posiciones_vivas(pos, MAGIC_NUMBER)
-
-            dash = []
-            for s in activos:
-                rates = mt5.copy_rates_from_pos(s, TIMEFRAME, 0, 300)
-                if rates is None or s not in MODELOS_IA: continue
-                df = pd.DataFrame(rates)
-                df['rsi'], df['ema_l'], df['atr'] = ta.rsi(df['close'], 14), ta.ema(df['close'], 200), ta.atr(df['high'], df['low'], df['close'], 14)
-                df['ema_r'], df['volatilidad'] = ta.ema(df['close'], 50), df['high'] - df['low']
-                last = df.dropna().iloc[-1]
-                
-                prob = MODELOS_IA[s].predict_proba(pd.DataFrame([last[FEATURES].values], columns=FEATURES))[0][1]
-                
-                # Lógica Verbos
-                signal, motivo = "ESPERAR", "IA Neutral"
-                if prob > PROBABILIDAD_IA_MINIMA:
-                    if last['close'] > last['ema_l']: signal = "COMPRA"
-                    else: motivo = "EMA Filtro"
-                elif prob < (1 - PROBABILIDAD_IA_MINIMA):
-                    if last['close'] < last['ema_l']: signal = "VENTA"
-                    else: motivo = "EMA Filtro"
-
-                is_open = any(p.symbol == s for p in pos) if pos else False
-                if signal != "ESPERAR" and not is_open and len(pos or []) < MAX_POSICIONES_GLOBALES:
-                    abrir_orden(signal, s, last['atr'])
-
-                db_pool.submit(db.actualizar_estado_bot, True, acc.balance, acc.equity)
-                db_pool.submit(db.sincronizar_trades, MAGIC_NUMBER)
-                db_pool.submit(db.actualizar_monitoreo, s, float(last['close']), float(last['rsi']), float(prob), "ABIERTA" if is_open else signal)
-                dash.append({"s":s, "ia":prob, "st": "ABIERTA" if is_open else signal, "m": motivo if signal=="ESPERAR" else "OK"})
-
-            os.system('cls')
-            print(f"--- SENTINEL v6.1 | {datetime.now().strftime('%H:%M:%S')} | Balance: {acc.balance} ---")
-            for d in dash: print(f"{d['s']:<10} | IA: {d['ia']:.2%} | {d['st']:<10} | {d['m']}")
-            for l in reversed(LOG_BUFFER): print(f"> {l}")
-            time.sleep(15)
-        except Exception as e: print(f"Error: {e}"); time.sleep(10)
\ No newline at end of file
+
+    def mantenimiento():
+        acc = ciclo_mantenimiento(db_pool, activos)
+        mostrar_panel(acc, [PANEL[s] for s in activos if s in PANEL])
+
+    def registrar_modelo(fut):
+        sym, mod = fut.result()
+        if mod: MODELOS_IA[sym] = mod
+
+    def al_cambiar_universo(nuevos):
+        """Llega desde el hilo del ranking: se entrena lo nuevo en segundo plano y se cambia la lista en caliente"""
+        global activos
+        SIMBOLOS.precargar([s for s in nuevos if s not in activos])
+        for s in nuevos:
+            if s in MODELOS_IA: continue
+            ALMACEN.sincronizar(s, HISTORIAL_ALMACEN)
+            pool_entrenamiento.submit(tarea_entrenamiento, s).add_done_callback(registrar_modelo)
+        agregar_log(f"🔄 Universo: +{sorted(set(nuevos) - set(activos))} -{sorted(set(activos) - set(nuevos))}")
+        activos = nuevos
+        planificador.actualizar_activos(nuevos)
+
+    def al_incumplir(tarea, symbol, demora):
+        agregar_log(f"⏱️ Plazo incumplido: {tarea} {symbol} ({demora:.1f}s)")
+
+    # 5. Bucle por eventos: vela nueva / ticks -> evaluación; protección y BD con cadencia propia
+    #    (FLUJO_TICKS ya protege a cadencia de tick los símbolos con posición abierta)
+    planificador = Planificador(
+        activos, evaluar=lambda s: evaluar_simbolo(s, POSICIONES, db_pool),
+        proteger=ciclo_proteccion, mantenimiento=mantenimiento,
+        periodo_vela=PERIODO_VELA_S, max_concurrencia=MAX_EVALUACIONES_CONCURRENTES,
+        intervalo_sondeo=INTERVALO_SONDEO, intervalo_min_evaluacion=INTERVALO_MIN_EVALUACION,
+        intervalo_proteccion=INTERVALO_PROTECCION, intervalo_mantenimiento=INTERVALO_MANTENIMIENTO,
+        plazo_nueva_vela=PLAZO_NUEVA_VELA, plazo_evaluacion=PLAZO_EVALUACION, al_incumplir=al_incumplir)
+    ranking.al_cambiar = al_cambiar_universo
+    ranking.iniciar()
+    planificador.ejecutar()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import os, json, time, tempfile
+
+try: import fcntl
+except ImportError: fcntl = None  # Windows: sin single-flight entre procesos, cada worker recalcula
+
+# ==========================================
+# CACHÉ COMPARTIDA ENTRE WORKERS DE LA API
+# ==========================================
+# Un fichero JSON por clave en /dev/shm (memoria) con su caducidad. Todos los workers de uvicorn
+# leen el mismo valor; cuando caduca, un flock por clave hace que solo UN proceso vuelva a consultar
+# MySQL (single-flight). Mientras tanto los demás sirven el valor caducado en vez de esperar; solo
+# esperan si aún no hay ninguno (arranque). Es bloqueante: llamar desde handlers `def` (threadpool).
+
+class CacheCompartido:
+    def __init__(self, directorio=None, prefijo="traderbot_api"):
+        base = directorio or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+        self.directorio = os.path.join(base, prefijo)
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def _leer(self, clave):
+        """(valor, vigente); (None, False) si no existe o no se puede leer"""
+        try:
+            with open(self._ruta(clave)) as f: dato = json.load(f)
+            return dato["valor"], dato["expira"] > time.time()
+        except (OSError, ValueError, KeyError): return None, False
+
+    def _escribir(self, clave, valor, ttl):
+        tmp = f"{self._ruta(clave)}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f: json.dump({"expira": time.time() + ttl, "valor": valor}, f)
+        os.replace(tmp, self._ruta(clave))  # Atómico: un lector ve el valor viejo o el nuevo, nunca medio
+
+    def obtener(self, clave, ttl, calcular):
+        """Valor de `clave` si no ha caducado; si no, `calcular()` en un solo proceso a la vez"""
+        valor, vigente = self._leer(clave)
+        if vigente: return valor
+        if fcntl is None:
+            valor = calcular(); self._escribir(clave, valor, ttl)
+            return valor
+        with open(os.path.join(self.directorio, f"{clave}.lock"), "a+") as lock:
+            try: fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if valor is not None: return valor  # Otro worker lo está refrescando: se sirve el caducado
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                valor, vigente = self._leer(clave)  # Otro worker pudo recalcularlo mientras esperábamos
+                if vigente: return valor
+                valor = calcular()
+                self._escribir(clave, valor, ttl)
+                return valor
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def invalidar(self, clave):
+        try: os.remove(self._ruta(clave))
+        except OSError: pass